@@ -0,0 +1,230 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Admission(NamedTuple):
+    admitted: bool
+    reason: str = ""
+    retry_after: float = 0.0
+
+
+class TokenBucket:
+    """Refills ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float = 1.0) -> Tuple[bool, float]:
+        """
+        Take ``amount`` tokens. Returns (taken, seconds until they would be
+        available); the wait is ``inf`` when the bucket can never hold them.
+        """
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True, 0.0
+        if self.rate <= 0 or amount > self.capacity:
+            return False, math.inf
+        return False, (amount - self.tokens) / self.rate
+
+    def refund(self, amount: float = 1.0):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class DepartmentBudget:
+    """
+    Request-rate and spend buckets for one department. ``cost_per_hour``
+    refills continuously; ``cost_burst_seconds`` of it may be spent at once.
+    """
+
+    def __init__(self, rps: float = 5.0, burst: float = 20.0, cost_per_hour: float = 5.0,
+                 cost_burst_seconds: float = 300.0, priority: int = 5):
+        self.priority = priority
+        self.requests = TokenBucket(rps, burst)
+        self.spend = TokenBucket(cost_per_hour / 3600, cost_per_hour * cost_burst_seconds / 3600)
+
+    def try_take(self, cost: float) -> Admission:
+        taken, wait = self.requests.try_take(1.0)
+        if not taken:
+            return Admission(False, "rate", wait)
+        taken, wait = self.spend.try_take(cost)
+        if not taken:
+            self.requests.refund(1.0)
+            return Admission(False, "budget", wait)
+        return Admission(True)
+
+    def refund(self, cost: float, request: bool = True):
+        """Give back the estimated ``cost`` (and the request token, unless the request was served)."""
+        if request:
+            self.requests.refund(1.0)
+        self.spend.refund(cost)
+
+
+class AdmissionController:
+    """
+    Front door for queued work: per-department token buckets (request rate
+    and estimated spend), then a bounded priority queue drained by a fixed
+    pool of ``workers``. Lower ``priority`` values are served first; within a
+    priority, first come first served.
+
+    Anything that cannot be admitted is refused immediately with a
+    Retry-After hint instead of piling up behind the upstream. Work that
+    still waits longer than ``max_wait`` is dropped when it reaches a worker.
+    Streams skip the queue (they must start at once) but are capped at
+    ``max_streams`` open at a time.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, Dict]] = None, default_budget: Optional[Dict] = None,
+                 max_queue: int = 256, workers: int = 16, max_wait: float = 30.0, max_streams: int = 16):
+        self.budget_config = budgets or {}
+        self.default_budget = default_budget or {}
+        self.max_queue = max_queue
+        self.workers = workers
+        self.max_wait = max_wait
+        self.max_streams = max_streams
+        self.budgets: Dict[str, DepartmentBudget] = {}
+        self.metrics = {
+            "admitted": 0, "rejected_rate": 0, "rejected_budget": 0, "rejected_queue": 0, "rejected_streams": 0,
+            "expired": 0, "refunded": 0, "completed": 0, "in_service": 0, "streams_open": 0
+        }
+        self._waits = deque(maxlen=1000)
+        self._service_ewma = 1.0  # Seconds per job, seeds the Retry-After estimate
+        self._seq = itertools.count()
+        self._loop = None
+        self._queue = None
+        self._workers = []
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            budgets=json.loads(os.getenv("ADMISSION_BUDGETS", "{}")),
+            default_budget={
+                "rps": float(os.getenv("ADMISSION_RPS", "5")),
+                "burst": float(os.getenv("ADMISSION_BURST", "20")),
+                "cost_per_hour": float(os.getenv("ADMISSION_COST_PER_HOUR", "5")),
+            },
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+            workers=int(os.getenv("ADMISSION_WORKERS", "16")),
+            max_wait=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30")),
+            max_streams=int(os.getenv("ADMISSION_MAX_STREAMS", "16"))
+        )
+
+    def budget(self, department: str) -> DepartmentBudget:
+        budget = self.budgets.get(department)
+        if budget is None:
+            budget = self.budgets[department] = DepartmentBudget(
+                **{**self.default_budget, **self.budget_config.get(department, {})}
+            )
+        return budget
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._workers = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def _queue_retry_after(self) -> float:
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1.0, depth * self._service_ewma / max(self.workers, 1))
+
+    def check(self, department: str, cost: float) -> Admission:
+        """Bucket check only; ``submit`` and ``open_stream`` add the queue and stream limits."""
+        admission = self.budget(department).try_take(cost)
+        if not admission.admitted:
+            self.metrics[f"rejected_{admission.reason}"] += 1
+        return admission
+
+    def refund(self, department: str, cost: float, request: bool = True):
+        """
+        Return the estimated spend of work that did not reach the upstream
+        (expired in the queue, blocked up front, answered from cache).
+        """
+        self.budget(department).refund(cost, request)
+        self.metrics["refunded"] += 1
+
+    def open_stream(self, department: str, cost: float) -> Admission:
+        """Admit a stream: a free stream slot, then the department's buckets. Pair with ``close_stream``."""
+        if self.metrics["streams_open"] >= self.max_streams:
+            self.metrics["rejected_streams"] += 1
+            return Admission(False, "streams", max(1.0, self._service_ewma))
+        admission = self.check(department, cost)
+        if admission.admitted:
+            self.metrics["streams_open"] += 1
+        return admission
+
+    def close_stream(self):
+        self.metrics["streams_open"] -= 1
+
+    def submit(self, department: str, cost: float, job: Callable[[], Awaitable[None]],
+               on_expired: Optional[Callable[[float], None]] = None) -> Admission:
+        """Queue ``job`` for a worker, or refuse it."""
+        self._ensure_started()
+        if self._queue.qsize() >= self.max_queue:
+            self.metrics["rejected_queue"] += 1
+            return Admission(False, "queue", self._queue_retry_after())
+        admission = self.check(department, cost)
+        if not admission.admitted:
+            return admission
+        self.metrics["admitted"] += 1
+        priority = self.budget(department).priority
+        self._queue.put_nowait((priority, next(self._seq), time.monotonic(), job, on_expired))
+        return admission
+
+    async def _work(self):
+        while True:
+            _, _, enqueued_at, job, on_expired = await self._queue.get()
+            waited = time.monotonic() - enqueued_at
+            self._waits.append(waited)
+            metrics.observe("gateway_stage_seconds", waited, stage="queue")
+            if waited > self.max_wait:
+                self.metrics["expired"] += 1
+                if on_expired:
+                    on_expired(waited)
+                continue
+            self.metrics["in_service"] += 1
+            started = time.monotonic()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"❌ Queued job failed: {e}")
+            finally:
+                self.metrics["in_service"] -= 1
+                self.metrics["completed"] += 1
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * (time.monotonic() - started)
+
+    def _wait_percentile(self, pct: float) -> float:
+        ordered = sorted(self._waits)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "max_streams": self.max_streams,
+            "wait_p50_ms": round(self._wait_percentile(50) * 1000, 1),
+            "wait_p95_ms": round(self._wait_percentile(95) * 1000, 1)
+        }
@@ -1,43 +1,271 @@
+import os
+import json
+import math
 import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 from intelligence_engine import IntelligenceEngine
+from job_store import create_job_store
+from admission import AdmissionController
+from circuit_breaker import CircuitBreaker
+from telemetry import configure_logging, metrics
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Sovereign AI Gateway API")
 engine = IntelligenceEngine()
-job_store = {}
+job_store = create_job_store()
+admission = AdmissionController.from_env()
+
+# /readyz turns 200 once warm-up has run; GATEWAY_WARMUP=0 skips it (ready at once, first requests pay instead)
+readiness = {"ready": False, "steps": {}}
+
+async def warm_up():
+    try:
+        await engine.warm_up(readiness["steps"])
+        readiness["ready"] = True
+        logger.info("✅ Gateway ready")
+    except Exception as e:
+        readiness["error"] = repr(e)
+        logger.error(f"❌ Warm-up failed, gateway stays unready: {e!r}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In the background: /livez answers while litellm imports and the judge model loads
+    task = None
+    if os.getenv("GATEWAY_WARMUP", "1").lower() in ("0", "false", "no"):
+        readiness["ready"] = True
+    else:
+        task = asyncio.create_task(warm_up())
+    yield
+    if task:
+        task.cancel()
+
+app = FastAPI(title="Sovereign AI Gateway API", lifespan=lifespan)
+
+job_events: Dict[str, asyncio.Event] = {}  # Set the moment a job's result is stored
+
+MAX_WAIT_SECONDS = 60.0
+STORE_RECHECK_SECONDS = 0.5  # Backstop for jobs finished by another worker process
+SSE_HEARTBEAT_SECONDS = 15.0
+
+metrics.gauge("gateway_queue_depth", "Jobs waiting for an admission worker", lambda: admission.stats()["queue_depth"])
+metrics.gauge("gateway_jobs_in_service", "Jobs being processed by admission workers", lambda: admission.metrics["in_service"])
+metrics.gauge("gateway_streams_open", "Streams being served (capped by ADMISSION_MAX_STREAMS)", lambda: admission.metrics["streams_open"])
+metrics.gauge("gateway_coalesced_requests", "Requests that joined an identical in-flight call", lambda: engine.single_flight.coalesced)
+metrics.gauge("gateway_judge_queue_depth", "Drafts waiting for the AI judge", lambda: engine.tribunal.scheduler.stats()["queue_depth"])
+metrics.gauge("gateway_judge_in_flight", "AI judge calls in progress", lambda: engine.tribunal.scheduler.metrics["in_flight"])
+# Monotonic counts kept by the scheduler and the breaker, read at scrape time
+metrics.describe("gateway_judge_scheduler_total", "counter", "AI judge scheduler events: batches, calls, deduplicated drafts, failures and skips")
+for event in ("submitted", "batches", "judge_calls", "deduplicated", "failures", "budget_skips", "breaker_skips"):
+    metrics.gauge("gateway_judge_scheduler_total", "AI judge scheduler events",
+                  lambda event=event: engine.tribunal.scheduler.metrics[event], event=event)
+metrics.gauge("gateway_circuit_open", "1 while a circuit breaker is open or half-open",
+              lambda: float(engine.tribunal.breaker.state != CircuitBreaker.CLOSED), breaker=engine.tribunal.breaker.name)
+metrics.describe("gateway_circuit_trips_total", "counter", "Times a circuit breaker has opened")
+metrics.gauge("gateway_circuit_trips_total", "Times a circuit breaker has opened", lambda: engine.tribunal.breaker.trips, breaker=engine.tribunal.breaker.name)
+
+# Upstream model pool: per-model health (models appear as they are first called) and pool events
+def model_health(read):
+    return lambda: {model: read(health) for model, health in list(engine.pool.health.items())}
+
+metrics.gauge_family("gateway_model_latency_ewma_seconds", "EWMA latency of successful upstream calls", "model",
+                     model_health(lambda h: h.ewma_latency))
+metrics.gauge_family("gateway_model_latency_p95_seconds", "Recent p95 upstream latency (the hedging threshold)", "model",
+                     model_health(lambda h: h.percentile(95)))
+metrics.gauge_family("gateway_model_error_rate", "EWMA error rate of upstream calls", "model",
+                     model_health(lambda h: h.ewma_error))
+metrics.describe("gateway_model_calls_total", "counter", "Upstream calls per model")
+metrics.gauge_family("gateway_model_calls_total", "Upstream calls per model", "model", model_health(lambda h: h.calls))
+metrics.describe("gateway_model_failures_total", "counter", "Failed upstream calls per model")
+metrics.gauge_family("gateway_model_failures_total", "Failed upstream calls per model", "model",
+                     model_health(lambda h: h.failures))
+metrics.gauge_family("gateway_circuit_open", "1 while a circuit breaker is open or half-open", "breaker", lambda: {
+    health.breaker.name: float(health.breaker.state != CircuitBreaker.CLOSED) for health in list(engine.pool.health.values())
+})
+metrics.gauge_family("gateway_circuit_trips_total", "Times a circuit breaker has opened", "breaker", lambda: {
+    health.breaker.name: health.breaker.trips for health in list(engine.pool.health.values())
+})
+metrics.describe("gateway_model_pool_total", "counter", "Model pool events: fallbacks, hedges, hedge wins, exhausted chains")
+metrics.gauge_family("gateway_model_pool_total", "Model pool events", "event", lambda: dict(engine.pool.metrics))
 
 class QueryRequest(BaseModel):
     messages: List[Dict[str, str]]
     department: str = "marketing"
+    # With a session id the gateway keeps the (sanitized) history: send only the new message
+    session_id: Optional[str] = None
 
-def background_processor(job_id: str, messages: List[Dict[str, str]], dept: str):
+def settle(dept: str, cost: float, result: Dict):
+    """Hand the estimated spend back when the result never reached the upstream model."""
+    if result.get("model_used") == "BLOCKED" or result.get("cache_hit"):
+        admission.refund(dept, cost, request=False)
+
+async def background_processor(job_id: str, messages: List[Dict[str, str]], dept: str, session_id: Optional[str] = None,
+                               cost: float = 0.0):
     try:
-        prompt = messages[-1]["content"] if messages else ""
-        result = engine.process(prompt, dept)
+        prompt = messages[-1].get("content", "") if messages else ""
+        result = await engine.aprocess(prompt, dept, messages[:-1], session_id)
+        settle(dept, cost, result)
         job_store[job_id] = result
     except Exception as e:
         job_store[job_id] = {"status": "ERROR", "output": str(e)}
+    finally:
+        event = job_events.pop(job_id, None)
+        if event:
+            event.set()
+
+def overloaded(decision) -> HTTPException:
+    retry_after = max(1, math.ceil(min(decision.retry_after, 3600)))
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many requests ({decision.reason}); retry in {retry_after}s",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def expire_job(job_id: str, dept: str, cost: float, waited: float):
+    admission.refund(dept, cost)
+    job_store[job_id] = {"status": "ERROR", "output": f"Gateway overloaded: request waited {waited:.0f}s in queue. Please retry."}
+    event = job_events.pop(job_id, None)
+    if event:
+        event.set()
+
+def is_pending(job: Optional[Dict]) -> bool:
+    return job is not None and job.get("status") == "PROCESSING"
+
+async def wait_for_job(job_id: str, timeout: float) -> Optional[Dict]:
+    """Return the job once it leaves PROCESSING, or its current state after ``timeout`` seconds."""
+    job = job_store.get(job_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while is_pending(job):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        event = job_events.get(job_id)
+        try:
+            if event:
+                await asyncio.wait_for(event.wait(), min(remaining, STORE_RECHECK_SECONDS * 10))
+            else:
+                await asyncio.sleep(min(remaining, STORE_RECHECK_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+        job = job_store.get(job_id)
+    return job
 
 @app.post("/submit")
-async def submit(req: QueryRequest, background_tasks: BackgroundTasks):
+async def submit(req: QueryRequest):
     job_id = str(uuid.uuid4())
+    prompt = req.messages[-1].get("content", "") if req.messages else ""
+    cost = engine.estimate_cost(prompt, req.department)
+    decision = admission.submit(
+        req.department, cost,
+        lambda: background_processor(job_id, req.messages, req.department, req.session_id, cost),
+        on_expired=lambda waited: expire_job(job_id, req.department, cost, waited)
+    )
+    if not decision.admitted:
+        raise overloaded(decision)
     job_store[job_id] = {"status": "PROCESSING"}
-    background_tasks.add_task(background_processor, job_id, req.messages, req.department)
+    job_events[job_id] = asyncio.Event()
     return {"request_id": job_id, "status": "QUEUED"}
 
+@app.post("/submit/stream")
+async def submit_stream(req: QueryRequest):
+    """
+    Server-Sent Events: a ``job`` event with the request id, ``token`` events as
+    text clears the Tribunal's stream guard, then a final ``result`` event.
+    """
+    job_id = str(uuid.uuid4())
+    prompt = req.messages[-1].get("content", "") if req.messages else ""
+    # Streams run immediately: no queue, but a cap on open streams on top of the department's buckets
+    cost = engine.estimate_cost(prompt, req.department)
+    decision = admission.open_stream(req.department, cost)
+    if not decision.admitted:
+        raise overloaded(decision)
+    job_store[job_id] = {"status": "PROCESSING"}
+
+    async def stream():
+        result = {"status": "ERROR", "output": "Stream interrupted"}
+        try:
+            yield f"event: job\ndata: {json.dumps({'request_id': job_id})}\n\n"
+            async for event in engine.astream(prompt, req.department, req.messages[:-1], req.session_id):
+                if event["type"] == "token":
+                    yield f"event: token\ndata: {json.dumps({'text': event['text']})}\n\n"
+                else:
+                    result = {k: v for k, v in event.items() if k != "type"}
+                    settle(req.department, cost, result)
+        except Exception as e:
+            result = {"status": "ERROR", "output": str(e)}
+        finally:
+            admission.close_stream()
+            job_store[job_id] = result
+        yield f"event: result\ndata: {json.dumps(result)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/status/{request_id}")
-def get_status(request_id: str):
-    job = job_store.get(request_id)
+async def get_status(request_id: str, wait: float = 0.0):
+    """Job state; with ``?wait=N`` the call long-polls up to N seconds for completion."""
+    job = await wait_for_job(request_id, min(max(wait, 0.0), MAX_WAIT_SECONDS))
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
+@app.get("/events/{request_id}")
+async def job_events_stream(request_id: str):
+    """Server-Sent Events: heartbeats while processing, then one ``result`` event."""
+    if not job_store.get(request_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        while True:
+            job = await wait_for_job(request_id, SSE_HEARTBEAT_SECONDS)
+            if is_pending(job):
+                yield ": keep-alive\n\n"
+                continue
+            if job is None:
+                job = {"status": "ERROR", "output": "Job expired"}
+            yield f"event: result\ndata: {json.dumps(job)}\n\n"
+            return
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.delete("/sessions/{session_id}")
+def end_session(session_id: str):
+    """Forget a conversation's stored turns and summary."""
+    if not engine.sessions.drop(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "status": "DELETED"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition: stage histograms, outcome counters, queue gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/livez")
+def livez():
+    """Liveness: the process is up and serving."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once warm-up has finished, 503 (with per-step progress) until then."""
+    state = "ready" if readiness["ready"] else "failed" if "error" in readiness else "warming_up"
+    body = {"status": state, **readiness}
+    return JSONResponse(body, status_code=200 if readiness["ready"] else 503)
+
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "Sovereign AI Gateway"}
+    return {"status": "healthy", "service": "Sovereign AI Gateway", "admission": admission.stats(),
+            "judge": engine.tribunal.scheduler.stats(), "models": engine.pool.stats(), "sessions": engine.sessions.stats(),
+            "audit": engine.audit.stats() if engine.audit else None}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,384 @@
+"""
+Append-only audit log of gateway decisions.
+
+    python audit_log.py query [--dir audit_log] [--since 2026-01-01] [--until ...]
+        [--department marketing] [--verdict FAIL]
+    python audit_log.py summary [--dir audit_log] [--since ...] [--department ...]
+
+Records are written by a background thread, never by the request.
+"""
+import os
+import sys
+import json
+import glob
+import gzip
+import time
+import zlib
+import queue
+import atexit
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = "audit-*.jsonl.gz"
+INDEX_FILE = "index.jsonl"
+
+_STOP = object()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """
+    Records of one segment, in write order. A segment is a series of gzip
+    members (one per batch); a member cut short by a crash ends the read.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error, ValueError) as e:
+        logger.warning(f"⚠️ Audit segment {os.path.basename(path)} ends in a partial batch: {e}")
+
+
+class SegmentInfo:
+    """Index entry for one segment: time range, record count and departments."""
+
+    def __init__(self, segment: str, first_ts: Optional[float] = None, last_ts: Optional[float] = None,
+                 records: int = 0, departments: Optional[Dict[str, int]] = None):
+        self.segment = segment
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.records = records
+        self.departments = Counter(departments or {})
+
+    def add(self, record: Dict):
+        ts = record["ts"]
+        self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        self.records += 1
+        self.departments[record.get("department", "")] += 1
+
+    def matches(self, since: Optional[float], until: Optional[float], department: Optional[str]) -> bool:
+        if not self.records:
+            return False
+        if since is not None and self.last_ts < since:
+            return False
+        if until is not None and self.first_ts > until:
+            return False
+        return department is None or department in self.departments
+
+    def to_dict(self) -> Dict:
+        return {"segment": self.segment, "first_ts": self.first_ts, "last_ts": self.last_ts,
+                "records": self.records, "departments": dict(self.departments)}
+
+
+class AuditLog:
+    """
+    Batched, append-only audit trail under ``directory``.
+
+    ``record()`` only enqueues; a writer thread gathers records for up to
+    ``flush_interval`` seconds and appends each batch to the open segment
+    as one gzip member, fsyncing at most every ``fsync_interval`` seconds.
+    A full queue drops the record (counted) rather than slow a request.
+
+    Segments (``audit-<start ms>-<pid>.jsonl.gz``) rotate by size and age.
+    Each closed segment gets a line in ``index.jsonl`` with its time range
+    and departments, so ``query()`` opens only the segments that can
+    match; segments not yet indexed (open in a live worker, or left by a
+    crash) are always scanned. Nothing is created until the first record.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 0.2, fsync_interval: float = 1.0,
+                 segment_max_bytes: int = 64 * 1024 * 1024, segment_max_seconds: float = 86400,
+                 max_queue: int = 10000, max_batch: int = 1000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._current: Optional[SegmentInfo] = None
+        self._opened_at = 0.0
+        self._synced_at = 0.0
+        self._dirty = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.segments = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["AuditLog"]:
+        """``AUDIT_LOG_DIR`` (default ``audit_log``); an empty value disables the log."""
+        directory = os.getenv("AUDIT_LOG_DIR", "audit_log")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            flush_interval=float(os.getenv("AUDIT_FLUSH_SECONDS", "0.2")),
+            fsync_interval=float(os.getenv("AUDIT_FSYNC_SECONDS", "1.0")),
+            segment_max_bytes=int(float(os.getenv("AUDIT_SEGMENT_MB", "64")) * 1024 * 1024),
+            segment_max_seconds=float(os.getenv("AUDIT_SEGMENT_HOURS", "24")) * 3600,
+            max_queue=int(os.getenv("AUDIT_MAX_QUEUE", "10000"))
+        )
+
+    def record(self, entry: Dict):
+        """Queue one record (a ``ts`` is added if missing). Never blocks."""
+        if self._thread is None:
+            self._start()
+        if "ts" not in entry:
+            entry = {"ts": round(time.time(), 3), **entry}
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("gateway_audit_records_total", result="dropped")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+            logger.info(f"📒 Audit log at {self.directory}")
+
+    def close(self, timeout: float = 5.0):
+        """Flush what is queued, index the open segment and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("❌ Audit queue still full at shutdown, stopping without a final flush")
+            return
+        thread.join(timeout)
+
+    def _run(self):
+        # Directory setup and crash recovery (which may gunzip whole segments) happen here,
+        # never on the thread that called record(); records queue up meanwhile
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._recover()
+        except OSError as e:
+            logger.error(f"❌ Audit log recovery failed: {e}")
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                self._sync()
+                continue
+            batch, stop = [], item is _STOP
+            if not stop:
+                batch.append(item)
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write(batch)
+                self._sync()
+            except OSError as e:
+                self.dropped += len(batch)
+                metrics.inc("gateway_audit_records_total", len(batch), result="dropped")
+                logger.error(f"❌ Audit write failed, {len(batch)} records lost: {e}")
+            if stop:
+                self._rotate()
+                return
+
+    def _write(self, batch: List[Dict]):
+        now = time.time()
+        if self._file is not None and (self._file.tell() >= self.segment_max_bytes
+                                       or now - self._opened_at >= self.segment_max_seconds):
+            self._rotate()
+        if self._file is None:
+            name = f"audit-{int(now * 1000)}-{os.getpid()}.jsonl.gz"
+            self._file = open(os.path.join(self.directory, name), "ab")
+            self._current = SegmentInfo(name)
+            self._opened_at = now
+            self.segments += 1
+
+        payload = "".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False) + "\n" for r in batch)
+        self._file.write(gzip.compress(payload.encode("utf-8"), compresslevel=6))
+        self._file.flush()
+        self._dirty = True
+        for entry in batch:
+            self._current.add(entry)
+        self.written += len(batch)
+        self.batches += 1
+        metrics.inc("gateway_audit_records_total", len(batch), result="written")
+
+    def _sync(self):
+        if self._dirty and time.monotonic() - self._synced_at >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._synced_at = time.monotonic()
+            self._dirty = False
+
+    def _rotate(self):
+        if self._file is None:
+            return
+        self._synced_at = 0.0
+        self._sync()
+        self._file.close()
+        self._file = None
+        if self._current.records:
+            self._index(self._current)
+        else:
+            os.remove(os.path.join(self.directory, self._current.segment))
+        self._current = None
+
+    def _index(self, info: SegmentInfo):
+        with open(os.path.join(self.directory, INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(info.to_dict(), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _recover(self):
+        """Index segments left unindexed by a process that is gone."""
+        indexed = load_index(self.directory)
+        for path in sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN))):
+            name = os.path.basename(path)
+            if name in indexed:
+                continue
+            try:
+                pid = int(name.rsplit("-", 1)[1].split(".", 1)[0])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and _alive(pid):
+                continue
+            info = SegmentInfo(name)
+            for entry in read_segment(path):
+                info.add(entry)
+            if info.records:
+                self._index(info)
+                logger.info(f"📒 Indexed {info.records} audit records left in {name}")
+
+    def stats(self) -> Dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "segments": self.segments,
+            "queue_depth": self._queue.qsize()
+        }
+
+
+def load_index(directory: str) -> Dict[str, SegmentInfo]:
+    """Segment name -> index entry (the last entry wins)."""
+    indexed = {}
+    try:
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                indexed[entry["segment"]] = SegmentInfo(**entry)
+    except FileNotFoundError:
+        pass
+    return indexed
+
+
+def query(directory: str, since: Optional[float] = None, until: Optional[float] = None,
+          department: Optional[str] = None, verdict: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Records in ``[since, until]`` (epoch seconds), optionally for one
+    department and verdict, segment by segment. Indexed segments outside
+    the range or without the department are skipped unopened.
+    """
+    indexed = load_index(directory)
+    for path in sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN))):
+        info = indexed.get(os.path.basename(path))
+        if info is not None and not info.matches(since, until, department):
+            continue
+        for entry in read_segment(path):
+            ts = entry.get("ts", 0)
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts > until:
+                continue
+            if department is not None and entry.get("department") != department:
+                continue
+            if verdict is not None and entry.get("verdict") != verdict:
+                continue
+            yield entry
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the gateway audit log")
+    parser.add_argument("command", choices=("query", "summary"))
+    parser.add_argument("--dir", default=os.getenv("AUDIT_LOG_DIR") or "audit_log")
+    parser.add_argument("--since", default=None, help="ISO date/time (UTC if no offset) or epoch seconds")
+    parser.add_argument("--until", default=None, help="ISO date/time (UTC if no offset) or epoch seconds")
+    parser.add_argument("--department", default=None)
+    parser.add_argument("--verdict", default=None, help="PASS, FAIL or ERROR")
+    args = parser.parse_args(argv)
+
+    records = query(args.dir, _timestamp(args.since), _timestamp(args.until), args.department, args.verdict)
+    if args.command == "query":
+        for entry in records:
+            print(json.dumps(entry, ensure_ascii=False))
+        return 0
+
+    verdicts, entities, models = Counter(), Counter(), Counter()
+    total, savings = 0, 0.0
+    for entry in records:
+        total += 1
+        savings += entry.get("savings", 0.0)
+        verdicts[entry.get("verdict")] += 1
+        models[entry.get("model")] += 1
+        entities.update(entry.get("entities", []))
+    print(json.dumps({
+        "records": total,
+        "savings": round(savings, 6),
+        "verdicts": dict(verdicts),
+        "models": dict(models),
+        "entities": dict(entities)
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Shared helpers for the benchmark scripts (percentiles, RSS, result files)."""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples: List[float], scale: float = 1.0, digits: int = 3) -> Dict[str, float]:
+    """count/mean/p50/p95/p99/max of ``samples`` multiplied by ``scale``."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * scale, digits),
+        "p50": round(percentile(samples, 50) * scale, digits),
+        "p95": round(percentile(samples, 95) * scale, digits),
+        "p99": round(percentile(samples, 99) * scale, digits),
+        "max": round(max(samples) * scale, digits)
+    }
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size of ``pid`` (default: this process) in MB; None where /proc is missing."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return None
+
+
+def environment() -> Dict:
+    """Where and on what revision the numbers were taken, so result files can be compared."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return {
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+
+def write_results(results: Dict, path: Optional[str]):
+    print(json.dumps(results, indent=2))
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,59 @@
+"""
+Diff two benchmark result files.
+
+    python benchmarks/compare_results.py baseline.json candidate.json [--threshold 10]
+
+Prints every numeric metric present in both files with its relative change;
+changes beyond ``--threshold`` percent are flagged. Exit code 0 always: the
+reader decides which direction is a regression for each metric.
+"""
+import sys
+import json
+import argparse
+from typing import Dict
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        # Rows such as sanitize results are keyed by their identifying fields where present
+        items = []
+        for i, row in enumerate(value):
+            key = str(i)
+            if isinstance(row, dict) and "chars" in row:
+                key = f"{row['chars']}c/{row.get('entities_per_1k', 0)}e"
+            items.append((key, row))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    else:
+        return {}
+    flat = {}
+    for key, child in items:
+        flat.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Flag changes beyond this percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        old = flatten({k: v for k, v in json.load(f).items() if k != "environment"})
+    with open(args.candidate, "r", encoding="utf-8") as f:
+        new = flatten({k: v for k, v in json.load(f).items() if k != "environment"})
+
+    width = max((len(k) for k in old.keys() & new.keys()), default=10)
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else 0.0
+        flag = "  <<" if abs(change) > args.threshold else ""
+        print(f"{key:<{width}}  {before:>12g}  {after:>12g}  {change:+7.1f}%{flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+End-to-end load generator for the gateway API.
+
+    python benchmarks/load_test.py [--requests 500] [--concurrency 32]
+        [--llm-latency 0.2] [--judge-latency 0.05] [--json out.json]
+
+Starts the stub providers (stub_servers.py) and a gateway pointed at them,
+then drives POST /submit + GET /status?wait= from ``--concurrency`` client
+threads. Reports throughput, end-to-end latency percentiles, rejections,
+gateway RSS growth and the server-side stage quantiles from /metrics.
+Use ``--gateway-url`` to target a gateway you started yourself.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import ROOT, environment, rss_mb, summarize, write_results  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROMPTS = (
+    "Draft a thank-you email to the {n} team for their hard work",
+    "Summarize the key points of announcement number {n}",
+    "Debug this Python race condition in worker {n}",
+    "Write a short product description for item {n}",
+    "Customer {n} paid with card 4242 4242 4242 4242, draft a receipt email",
+    "Optimize this SQL query that joins five tables for report {n}",
+)
+DEPARTMENTS = ("marketing", "engineering", "legal", "sales")
+
+_STAGE_QUANTILE = re.compile(r'^gateway_stage_seconds_window\{stage="([^"]+)",quantile="([^"]+)"\} ([0-9.eE+-]+)$')
+
+
+def wait_until_up(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not up after {timeout:.0f}s")
+
+
+def start_stack(args) -> List[subprocess.Popen]:
+    stubs = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "stub_servers.py"),
+        "--openai-port", str(args.openai_port), "--ollama-port", str(args.ollama_port),
+        "--llm-latency", str(args.llm_latency), "--judge-latency", str(args.judge_latency),
+        "--jitter", str(args.jitter), "--error-rate", str(args.error_rate)
+    ])
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench"),
+        "OPENAI_API_BASE": f"http://127.0.0.1:{args.openai_port}/v1",
+        "OLLAMA_API_BASE": f"http://127.0.0.1:{args.ollama_port}",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        # Measure the pipeline, not the admission budgets (unless asked to)
+        "ADMISSION_RPS": os.getenv("ADMISSION_RPS", "100000"),
+        "ADMISSION_BURST": os.getenv("ADMISSION_BURST", "100000"),
+        "ADMISSION_COST_PER_HOUR": os.getenv("ADMISSION_COST_PER_HOUR", "1000000"),
+    }
+    gateway = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "api_server:app",
+        "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"
+    ], cwd=ROOT, env=env)
+    processes = [stubs, gateway]
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.openai_port}/stats", 30, stubs)
+        wait_until_up(f"http://127.0.0.1:{args.port}/readyz", args.startup_timeout, gateway)
+    except Exception:
+        stop_stack(processes)
+        raise
+    return processes
+
+
+def stop_stack(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = rss_mb(pid) if pid else None
+        self._stop = threading.Event()
+
+    def run(self):
+        while self.pid and not self._stop.wait(self.interval):
+            current = rss_mb(self.pid)
+            if current is not None:
+                self.peak = max(self.peak or 0.0, current)
+
+    def stop(self):
+        self._stop.set()
+
+
+def make_workload(count: int, repeat_ratio: float, seed: int):
+    rng = random.Random(seed)
+    workload = []
+    for n in range(count):
+        if workload and rng.random() < repeat_ratio:
+            workload.append(rng.choice(workload))
+        else:
+            workload.append((rng.choice(PROMPTS).format(n=n), rng.choice(DEPARTMENTS)))
+    return workload
+
+
+def run_load(base_url: str, workload, concurrency: int, poll_wait: float) -> Dict:
+    local = threading.local()
+    outcomes = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def one(item):
+        prompt, department = item
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/submit", json={
+                "messages": [{"role": "user", "content": prompt}], "department": department
+            }, timeout=30)
+            if response.status_code == 429:
+                outcome = "REJECTED_429"
+            else:
+                response.raise_for_status()
+                request_id = response.json()["request_id"]
+                while True:
+                    job = session.get(f"{base_url}/status/{request_id}", params={"wait": poll_wait},
+                                      timeout=poll_wait + 10).json()
+                    if job.get("status") != "PROCESSING":
+                        break
+                outcome = f"{job.get('status')}_{job.get('verdict', '')}".rstrip("_")
+        except requests.RequestException as e:
+            outcome = f"CLIENT_ERROR_{type(e).__name__}"
+        elapsed = time.perf_counter() - started
+        with lock:
+            outcomes[outcome] += 1
+            if outcome.startswith("COMPLETED"):
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, workload))
+    wall = time.perf_counter() - started
+    return {
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(workload) / wall, 2),
+        "completed_rps": round(len(latencies) / wall, 2),
+        "latency_ms": summarize(latencies, 1000, 1),
+        "outcomes": dict(outcomes)
+    }
+
+
+def server_stages(base_url: str) -> Dict:
+    """Server-side per-stage p50/p95/p99 (ms) scraped from /metrics."""
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=5).text
+    except requests.RequestException:
+        return {}
+    stages: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        match = _STAGE_QUANTILE.match(line)
+        if match:
+            stage, quantile, value = match.groups()
+            stages.setdefault(stage, {})[f"p{int(float(quantile) * 100)}"] = round(float(value) * 1000, 3)
+    return stages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests before the run")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Fraction of requests that repeat an earlier prompt (exercises caches)")
+    parser.add_argument("--poll-wait", type=float, default=25.0, help="Long-poll seconds per /status call")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--judge-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--openai-port", type=int, default=9101)
+    parser.add_argument("--ollama-port", type=int, default=9102)
+    parser.add_argument("--startup-timeout", type=float, default=90.0)
+    parser.add_argument("--gateway-url", default=None, help="Use a running gateway instead of starting one")
+    parser.add_argument("--gateway-pid", type=int, default=None, help="PID of --gateway-url, for RSS")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    processes = [] if args.gateway_url else start_stack(args)
+    base_url = args.gateway_url or f"http://127.0.0.1:{args.port}"
+    pid = args.gateway_pid or (processes[1].pid if processes else None)
+    try:
+        run_load(base_url, make_workload(args.warmup, 0.0, args.seed + 1), min(args.concurrency, 4), args.poll_wait)
+        rss_start = rss_mb(pid) if pid else None
+        sampler = RssSampler(pid)
+        sampler.start()
+        load = run_load(base_url, make_workload(args.requests, args.repeat_ratio, args.seed),
+                        args.concurrency, args.poll_wait)
+        sampler.stop()
+        rss_end = rss_mb(pid) if pid else None
+        results = {
+            "benchmark": "load",
+            "environment": environment(),
+            "config": {
+                "requests": args.requests, "concurrency": args.concurrency, "repeat_ratio": args.repeat_ratio,
+                "llm_latency": args.llm_latency, "judge_latency": args.judge_latency,
+                "jitter": args.jitter, "error_rate": args.error_rate
+            },
+            **load,
+            "server_stage_ms": server_stages(base_url),
+            "gateway_rss_mb": {
+                "start": rss_start, "end": rss_end, "peak": sampler.peak,
+                "growth": round(rss_end - rss_start, 1) if rss_start is not None and rss_end is not None else None
+            }
+        }
+    finally:
+        stop_stack(processes)
+
+    write_results(results, args.json_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Microbenchmarks for the on-device hot paths.
+
+    python benchmarks/micro_benchmark.py [--quick] [--json out.json]
+
+Times ComplianceAirlock.sanitize across prompt sizes and entity densities,
+luhn_check, and the regex paths of Tribunal.verify (refusal auto-pass,
+credential block, clean draft that would go to the judge). No network.
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_utils import environment, rss_mb, summarize, write_results  # noqa: E402
+from compliance_airlock import ComplianceAirlock  # noqa: E402
+from tribunal_judges import Tribunal  # noqa: E402
+
+SIZES = (256, 4096, 65536, 1048576)
+DENSITIES = (0, 1, 10)  # Entities per 1,000 characters
+
+FILLER = (
+    "the quarterly report covers revenue growth across regions and the team will review "
+    "the forecast before the board meeting next week while marketing prepares the launch "
+).split()
+
+ENTITIES = (
+    "jane.doe@example.com",
+    "(415) 555-0134",
+    "4242 4242 4242 4242",        # Luhn-valid card
+    "1234 1234 1234 1234",        # Luhn-invalid: must survive
+    "123-45-6789",
+)
+
+DRAFTS = {
+    "refusal": "I'm sorry, but I can't assist with that request.",
+    "credential": "Sure, here is the config: api_key = 'abc123' and the rest of the file.",
+    "clean": "Here is a summary of the announcement: the office moves to the new campus in May. " * 6,
+}
+
+
+def make_prompt(size: int, density: int, rng: random.Random) -> str:
+    """Prose of about ``size`` characters with ``density`` entities per 1,000 characters."""
+    words, length = [], 0
+    every = 1000 // density if density else None
+    next_entity = every
+    while length < size:
+        if every and length >= next_entity:
+            word = rng.choice(ENTITIES)
+            next_entity += every
+        else:
+            word = rng.choice(FILLER)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def time_calls(fn, arg, min_runs: int, min_seconds: float):
+    """Per-call durations (seconds), at least ``min_runs`` calls and ``min_seconds`` of work."""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_runs or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions, skip the 1 MB prompt")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    min_runs, min_seconds = (3, 0.05) if args.quick else (10, 0.5)
+    sizes = SIZES[:-1] if args.quick else SIZES
+
+    logging.disable(logging.CRITICAL)  # Console I/O would swamp microsecond timings
+    rss_start = rss_mb()
+    airlock = ComplianceAirlock()
+    tribunal = Tribunal()
+
+    sanitize = []
+    for size in sizes:
+        for density in DENSITIES:
+            prompt = make_prompt(size, density, rng)
+            samples = time_calls(airlock.sanitize, prompt, min_runs, min_seconds)
+            result = airlock.sanitize(prompt)
+            sanitize.append({
+                "chars": len(prompt),
+                "entities_per_1k": density,
+                "us": summarize(samples, 1e6, 1),
+                "mb_per_s": round(len(prompt) / (sum(samples) / len(samples)) / 1e6, 2),
+                "entities_found": sorted(result["entities_found"])
+            })
+
+    cards = ["4242424242424242", "4242 4242 4242 4242", "1234-1234-1234-1234", "378282246310005"]
+    luhn = {
+        card: summarize(time_calls(airlock.luhn_check, card, min_runs * 100, min_seconds / 5), 1e9, 0)
+        for card in cards
+    }
+
+    verify = {
+        path: {
+            "us": summarize(time_calls(tribunal._precheck if path == "clean" else tribunal.verify, draft,
+                                       min_runs * 10, min_seconds / 5), 1e6, 2),
+            "verdict": (tribunal._precheck(draft) or {"verdict": "JUDGE"})["verdict"]
+        }
+        for path, draft in DRAFTS.items()
+    }
+
+    results = {
+        "benchmark": "micro",
+        "environment": environment(),
+        "sanitize": sanitize,
+        "luhn_check_ns": luhn,
+        "tribunal_verify": verify,
+        "rss_mb": {"start": rss_start, "end": rss_mb()}
+    }
+    write_results(results, args.json_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Accuracy/latency benchmark for the on-device Semantic Router.
+
+    python benchmarks/router_benchmark.py [--eval benchmarks/router_eval.jsonl] [--json out.json]
+
+Compares the router against the legacy keyword rule on a labeled prompt set
+and reports per-prompt and batched scoring latency.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_router import SemanticRouter  # noqa: E402
+from bench_utils import percentile  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_keyword_tier(prompt: str, department: str) -> str:
+    """The routing rule the gateway used before the Semantic Router."""
+    is_complex = (
+        department == "engineering" or
+        any(keyword in prompt.lower() for keyword in ["code", "debug", "algorithm", "function", "script"])
+    )
+    return "smart" if is_complex else "fast"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--eval", default=os.path.join(HERE, "router_eval.jsonl"))
+    parser.add_argument("--profiles", default=None, help="Tier table (defaults to router_profiles.json)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions over the eval set")
+    parser.add_argument("--json", dest="json_out", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with open(args.eval, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    prompts = [r["prompt"] for r in rows]
+    departments = [r.get("department", "marketing") for r in rows]
+
+    started = time.perf_counter()
+    router = SemanticRouter.from_file(args.profiles)
+    startup_ms = (time.perf_counter() - started) * 1000
+
+    decisions = router.route_batch(prompts, departments)
+    router_hits = sum(d.tier == r["label"] for d, r in zip(decisions, rows))
+    legacy_hits = sum(legacy_keyword_tier(p, d) == r["label"] for p, d, r in zip(prompts, departments, rows))
+    misses = [
+        {"prompt": r["prompt"], "department": r.get("department"), "expected": r["label"], "got": d.tier, "scores": d.scores}
+        for d, r in zip(decisions, rows) if d.tier != r["label"]
+    ]
+
+    single = []
+    for _ in range(args.repeat):
+        for prompt, dept in zip(prompts, departments):
+            t0 = time.perf_counter()
+            router.route(prompt, dept)
+            single.append((time.perf_counter() - t0) * 1e6)
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        router.route_batch(prompts, departments)
+    batch_us = (time.perf_counter() - t0) * 1e6 / (args.repeat * len(prompts))
+
+    results = {
+        "prompts": len(rows),
+        "startup_ms": round(startup_ms, 2),
+        "accuracy": round(router_hits / len(rows), 4),
+        "legacy_keyword_accuracy": round(legacy_hits / len(rows), 4),
+        "route_us": {
+            "p50": round(statistics.median(single), 1),
+            "p95": round(percentile(single, 95), 1),
+            "p99": round(percentile(single, 99), 1)
+        },
+        "route_batch_us_per_prompt": round(batch_us, 1),
+        "misses": misses
+    }
+    print(json.dumps(results, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Local stand-ins for the upstream providers, for load tests.
+
+    python benchmarks/stub_servers.py [--openai-port 9101] [--ollama-port 9102]
+        [--llm-latency 0.2] [--judge-latency 0.05] [--jitter 0.1] [--error-rate 0]
+
+An OpenAI-compatible server (``/v1/chat/completions``, streaming included)
+and an Ollama-compatible one (``/api/generate``, ``/api/chat``) that sleep
+for a configurable latency and fail a configurable fraction of calls.
+Point the gateway at them with OPENAI_API_BASE=http://127.0.0.1:9101/v1
+and OLLAMA_API_BASE=http://127.0.0.1:9102.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+ANSWER = (
+    "Thanks for the question. Here is a short, policy-compliant answer drafted by the "
+    "benchmark stub so that the gateway has a realistic amount of text to check."
+)
+
+
+class Upstream:
+    """Latency/failure model shared by both stubs: ``latency`` +- ``jitter`` (fraction), ``error_rate`` of 500s."""
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def respond(self):
+        self.calls += 1
+        delay = self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(max(0.0, delay))
+        if self.rng.random() < self.error_rate:
+            raise HTTPException(status_code=500, detail="Injected upstream failure")
+
+
+def openai_app(upstream: Upstream) -> FastAPI:
+    app = FastAPI(title="Stub OpenAI")
+
+    @app.post("/v1/chat/completions")
+    async def chat(body: dict):
+        await upstream.respond()
+        created = int(time.time())
+        if body.get("stream"):
+            async def chunks():
+                for word in ANSWER.split(" "):
+                    chunk = {
+                        "id": "stub", "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+        return {
+            "id": "stub", "object": "chat.completion", "created": created, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 30, "total_tokens": 40}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": upstream.calls}
+
+    return app
+
+
+def ollama_app(upstream: Upstream, verdict: str) -> FastAPI:
+    app = FastAPI(title="Stub Ollama")
+
+    def _reply(body: dict, **payload) -> dict:
+        return {
+            "model": body.get("model", "llama3.2"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "done": True, "done_reason": "stop", "prompt_eval_count": 10, "eval_count": 1, **payload
+        }
+
+    @app.post("/api/generate")
+    async def generate(body: dict):
+        await upstream.respond()
+        return _reply(body, response=verdict)
+
+    @app.post("/api/chat")
+    async def chat(body: dict):
+        await upstream.respond()
+        return _reply(body, message={"role": "assistant", "content": verdict})
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "llama3.2:latest", "model": "llama3.2:latest"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": upstream.calls}
+
+    return app
+
+
+async def serve(args):
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            openai_app(Upstream(args.llm_latency, args.jitter, args.error_rate, args.seed)),
+            host=args.host, port=args.openai_port, log_level="warning"
+        )),
+        uvicorn.Server(uvicorn.Config(
+            ollama_app(Upstream(args.judge_latency, args.jitter, args.error_rate, args.seed + 1), args.verdict),
+            host=args.host, port=args.ollama_port, log_level="warning"
+        ))
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--openai-port", type=int, default=9101)
+    parser.add_argument("--ollama-port", type=int, default=9102)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per completion")
+    parser.add_argument("--judge-latency", type=float, default=0.05, help="Seconds per judge call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Latency jitter as a fraction (0.1 = +-10%%)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("--verdict", default="SAFE", help="What the stub judge answers")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(serve(parser.parse_args(argv)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from telemetry import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Per-process engine, created once by the pool initializer
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    from intelligence_engine import IntelligenceEngine
+    logging.getLogger().setLevel(logging.WARNING)  # Keep worker start-up noise out of the audit output
+    _engine = IntelligenceEngine()
+
+
+def _extract(record: Dict, text_field: str, dept_field: str) -> Tuple[str, str]:
+    """Pull the prompt and department out of a historical record."""
+    prompt = record.get(text_field)
+    if prompt is None and record.get("messages"):
+        prompt = record["messages"][-1].get("content", "")
+    return str(prompt or ""), str(record.get(dept_field) or "marketing")
+
+
+def audit_record(engine, record: Dict, text_field: str = "prompt", dept_field: str = "department") -> Dict:
+    """
+    Run one record through the airlock and router without calling any model.
+
+    Returns:
+        dict: Findings, risk level and the model the gateway would have chosen
+    """
+    prompt, dept = _extract(record, text_field, dept_field)
+    sanitization = engine.airlock.sanitize(prompt)
+
+    if sanitization["risk_level"] == "HIGH":
+        model, savings = "BLOCKED", 0.0
+    else:
+        model, _, savings = engine.route(sanitization["safe_text"], dept)
+
+    return {
+        "request_id": record.get("request_id", record.get("id")),
+        "department": dept,
+        "risk_level": sanitization["risk_level"],
+        "pii_scrubbed": sanitization["was_scrubbed"],
+        "entities_found": sorted(sanitization["entities_found"]),
+        "model_used": model,
+        "savings": savings,
+        "sanitization_method": sanitization["method"]
+    }
+
+
+def _audit_batch(batch: List[Tuple[int, str]], text_field: str, dept_field: str) -> List[Tuple[str, str, bool]]:
+    """Worker entry point: parses and audits a block of raw JSONL lines."""
+    out = []
+    for line_no, line in batch:
+        try:
+            result = audit_record(_engine, json.loads(line), text_field, dept_field)
+            ok = True
+        except Exception as e:
+            result = {"status": "ERROR", "output": str(e)}
+            ok = False
+        result["line"] = line_no
+        out.append((json.dumps(result), result.get("risk_level", "ERROR"), ok))
+    return out
+
+
+def _batches(lines, batch_size: int) -> Iterator[List[Tuple[int, str]]]:
+    batch = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        batch.append((line_no, line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def audit_file(input_path: str, output_path: str, workers: Optional[int] = None, batch_size: int = 256,
+               text_field: str = "prompt", dept_field: str = "department") -> Dict:
+    """
+    Re-audit a JSONL file of historical prompts across all cores.
+
+    Args:
+        input_path: JSONL input, one record per line (``prompt`` or ``messages`` plus ``department``)
+        output_path: JSONL output, one audit result per input record, in input order
+        workers: Process count (defaults to ``os.cpu_count()``)
+        batch_size: Records shipped to a worker per task
+
+    Returns:
+        dict: Throughput statistics for the run
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4  # Bounds memory: the input is never read far ahead of the writer
+
+    records = errors = 0
+    risk_counts = Counter()
+    started = time.perf_counter()
+
+    with open(input_path, "r", encoding="utf-8") as src, \
+            open(output_path, "w", encoding="utf-8") as dst, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        task = partial(_audit_batch, text_field=text_field, dept_field=dept_field)
+        pending = deque()
+
+        def drain(limit: int):
+            nonlocal records, errors
+            while len(pending) > limit:
+                for line, risk, ok in pending.popleft().result():
+                    dst.write(line + "\n")
+                    records += 1
+                    risk_counts[risk] += 1
+                    errors += not ok
+
+        for batch in _batches(src, batch_size):
+            pending.append(pool.submit(task, batch))
+            drain(max_in_flight)
+        drain(0)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "records": records,
+        "errors": errors,
+        "workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": round(records / elapsed, 1) if elapsed > 0 else 0.0,
+        "risk_levels": dict(risk_counts)
+    }
+    logger.info(f"📊 Audit complete: {stats}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline bulk audit of historical prompts")
+    parser.add_argument("input", help="Input JSONL file (e.g. requests.jsonl)")
+    parser.add_argument("output", help="Output JSONL file for per-record findings")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Records per worker task")
+    parser.add_argument("--text-field", default="prompt", help="Record field holding the prompt")
+    parser.add_argument("--dept-field", default="department", help="Record field holding the department")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    stats = audit_file(args.input, args.output, args.workers, args.batch_size, args.text_field, args.dept_field)
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a text share a key."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(*parts: str) -> str:
+    """Stable SHA-256 key over one or more already-normalized parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class TieredCache:
+    """
+    Size- and TTL-bounded LRU cache with an optional SQLite tier underneath.
+
+    Values must be JSON-serializable. The memory tier answers hot keys; the
+    disk tier survives restarts and is shared by processes on the same host.
+    """
+
+    def __init__(self, name: str, max_entries: int = 4096, ttl_seconds: float = 3600,
+                 disk_path: Optional[str] = None, max_disk_entries: int = 100000):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("PRAGMA synchronous=NORMAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+            logger.info(f"💾 {name} cache disk tier at {disk_path}")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("gateway_cache_lookups_total", cache=self.name, result="hit")
+                    return entry[1]
+                del self._memory[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT expires_at, value FROM cache WHERE key = ? AND expires_at >= ?", (key, now)
+                ).fetchone()
+                if row:
+                    value = json.loads(row[1])
+                    self._remember(key, row[0], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    metrics.inc("gateway_cache_lookups_total", cache=self.name, result="disk_hit")
+                    return value
+
+            self.misses += 1
+            metrics.inc("gateway_cache_lookups_total", cache=self.name, result="miss")
+            return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(value))
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 512 == 0:
+                    self._evict_disk()
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        self._disk.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        self._disk.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._memory)
+        }
@@ -1,10 +1,18 @@
 import re
+import codecs
 import logging
-from typing import Dict, List, Tuple
+from itertools import combinations
+from typing import IO, AnyStr, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Luhn doubling table: digit -> (2 * digit) with the digits summed
+_LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+# Already-emitted characters kept in front of each streaming window so that
+# lookbehinds and word boundaries see the same context as a whole-text scan
+_STREAM_CONTEXT = 16
+
 class ComplianceAirlock:
     def __init__(self):
         self.secret_patterns = {
@@ -22,44 +30,125 @@ class ComplianceAirlock:
             "PHONE": r"\b(?:\+1[-.\s]?)?(?:\([0-9]{3}\)|[0-9]{3})[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b"
         }
         
+        # Literal prefilter: a detector is only compiled into the scanner when
+        # its cheapest required substring/character class occurs in the text.
+        self.detector_triggers = {
+            "AWS_KEY": "AKIA",
+            "OPENAI_KEY": "sk-",
+            "STRIPE_KEY": ("_test_", "_live_"),
+            "GITHUB_TOKEN": "ghp_",
+            "CREDIT_CARD": re.compile(r"\d"),
+            "US_SSN": re.compile(r"\d{3}"),
+            "EMAIL": "@",
+            "PHONE": re.compile(r"\d{3}"),
+        }
+
+        self._compile_engine()
         logger.info("🛡️ Compliance Airlock initialized: Luhn + Regex Mode")
 
+    def _compile_engine(self):
+        """Compiles every detector once and prepares the combined scanner cache."""
+        self._detectors = []
+        for severity, patterns in (("HIGH", self.secret_patterns), ("MEDIUM", self.pii_patterns)):
+            for label, pattern in patterns.items():
+                self._detectors.append((label, severity, re.compile(pattern)))
+        self._scanners = {}
+
+    def _scanner_for(self, active: Tuple[int, ...]):
+        """
+        One named-group automaton per set of active detectors. Each alternative
+        is a zero-width lookahead, so a single left-to-right pass reports every
+        position where at least one detector can start a match.
+        """
+        scanner = self._scanners.get(active)
+        if scanner is None:
+            scanner = re.compile("|".join(
+                f"(?=(?P<{self._detectors[i][0]}>{self._detectors[i][2].pattern}))" for i in active
+            ))
+            self._scanners[active] = scanner
+        return scanner
+
+    def warm_up(self) -> int:
+        """
+        Compile the scanners ordinary prompts need (every combination of the
+        PII detectors) ahead of the first request. Sets that include a secret
+        detector end in a block anyway and stay lazy. Returns the count.
+        """
+        pii = [i for i, (_, severity, _) in enumerate(self._detectors) if severity == "MEDIUM"]
+        for size in range(1, len(pii) + 1):
+            for active in combinations(pii, size):
+                self._scanner_for(active)
+        return len(self._scanners)
+
+    def _active_detectors(self, text: str) -> Tuple[int, ...]:
+        active = []
+        for i, (label, _, _) in enumerate(self._detectors):
+            trigger = self.detector_triggers.get(label)
+            if trigger is None:
+                hit = True
+            elif isinstance(trigger, str):
+                hit = trigger in text
+            elif isinstance(trigger, tuple):
+                hit = any(t in text for t in trigger)
+            else:
+                hit = trigger.search(text) is not None
+            if hit:
+                active.append(i)
+        return tuple(active)
+
     def luhn_check(self, card_number: str) -> bool:
         """Mathematically validates a credit card number."""
-        # Remove non-digits
-        digits = [int(d) for d in re.sub(r'\D', '', card_number)]
+        digits = [int(d) for d in card_number if d.isdecimal()]
         if not digits: return False
         
-        # Luhn Algorithm
-        checksum = 0
-        reverse_digits = digits[::-1]
-        for i, digit in enumerate(reverse_digits):
-            if i % 2 == 1:
-                digit *= 2
-                if digit > 9: digit -= 9
-            checksum += digit
+        # Luhn Algorithm: every second digit from the right goes through the table
+        checksum = sum(digits[-1::-2]) + sum(_LUHN_DOUBLED[d] for d in digits[-2::-2])
         return checksum % 10 == 0
 
-    def sanitize(self, text: str) -> Dict:
+    def _scan(self, text: str, pos: int = 0, endpos: int = None, resume: Optional[Dict[str, int]] = None,
+              raw: Optional[List[Tuple[int, int, str]]] = None) -> List[Tuple[int, int, str, str]]:
+        """
+        Returns the deduplicated, non-overlapping findings in ``text[pos:endpos]``
+        as ``(start, end, label, severity)`` sorted by start.
+
+        Each detector keeps its own resume offset, which reproduces running
+        ``re.finditer`` separately per pattern without rescanning the text.
+        ``resume`` seeds those offsets per label and ``raw`` collects every
+        detector match before validation, so a stream can carry the state
+        across windows.
+        """
+        if endpos is None:
+            endpos = len(text)
+        active = self._active_detectors(text)
+        if not active:
+            return []
+
         findings = []
-        
-        # A. Scan for Secrets (HIGH risk)
-        for label, pattern in self.secret_patterns.items():
-            for match in re.finditer(pattern, text):
-                findings.append((match.start(), match.end(), label, "HIGH"))
-        
-        # B. Scan for PII (MEDIUM risk)
-        for label, pattern in self.pii_patterns.items():
-            for match in re.finditer(pattern, text):
-                # Extra validation for Credit Cards
-                if label == "CREDIT_CARD":
-                    if self.luhn_check(match.group()):
-                        findings.append((match.start(), match.end(), label, "MEDIUM"))
+        offsets = {i: max(pos, resume.get(self._detectors[i][0], pos)) if resume else pos for i in active}
+        for hit in self._scanner_for(active).finditer(text, pos, endpos):
+            start = hit.start()
+            for i in active:
+                if offsets[i] > start:
+                    continue
+                label, severity, compiled = self._detectors[i]
+                if hit.group(label) is not None:
+                    end = hit.end(label)
                 else:
-                    findings.append((match.start(), match.end(), label, "MEDIUM"))
-        
-        # C. Deduplicate and Redact
-        findings = sorted(findings, key=lambda x: (x[0], -(x[1]-x[0])))
+                    match = compiled.match(text, start, endpos)
+                    if match is None:
+                        continue
+                    end = match.end()
+                # Zero-width matches are impossible for these detectors, but keep finditer semantics
+                offsets[i] = end if end > start else start + 1
+                if raw is not None:
+                    raw.append((start, end, label))
+                # Extra validation for Credit Cards
+                if label == "CREDIT_CARD" and not self.luhn_check(text[start:end]):
+                    continue
+                findings.append((start, end, label, severity))
+
+        # Deduplicate: earliest start wins, longest span breaks ties
+        findings.sort(key=lambda x: (x[0], -(x[1]-x[0])))
         unique_findings = []
         if findings:
             curr = findings[0]
@@ -68,16 +157,32 @@ class ComplianceAirlock:
                     unique_findings.append(curr)
                     curr = next_f
             unique_findings.append(curr)
-        
-        safe_text = text
-        entities_found = set()
+        return unique_findings
+
+    def _redact(self, text: str, findings, start: int, end: int, entities_found: set) -> Tuple[str, str]:
+        """
+        Builds the redacted form of ``text[start:end]`` in one forward pass.
+        ``findings`` must be sorted, non-overlapping and inside the range.
+        Returns ``(safe_text, risk_level)`` and records labels in ``entities_found``.
+        """
+        parts = []
+        cursor = start
         risk_level = "LOW"
         
-        for start, end, label, severity in sorted(unique_findings, key=lambda x: x[0], reverse=True):
-            safe_text = safe_text[:start] + f"<{label}_REDACTED>" + safe_text[end:]
+        for f_start, f_end, label, severity in findings:
+            parts.append(text[cursor:f_start])
+            parts.append(f"<{label}_REDACTED>")
+            cursor = f_end
             entities_found.add(label)
             if severity == "HIGH": risk_level = "HIGH"
             elif severity == "MEDIUM" and risk_level != "HIGH": risk_level = "MEDIUM"
+        parts.append(text[cursor:end])
+        return "".join(parts), risk_level
+
+    def sanitize(self, text: str) -> Dict:
+        unique_findings = self._scan(text)
+        entities_found = set()
+        safe_text, risk_level = self._redact(text, unique_findings, 0, len(text), entities_found)
         
         return {
             "safe_text": safe_text,
@@ -85,4 +190,83 @@ class ComplianceAirlock:
             "entities_found": list(entities_found),
             "risk_level": risk_level,
             "method": "Luhn-Validated Regex v4.0"
-        }
\ No newline at end of file
+        }
+
+    def sanitize_stream(self, source: Union[Iterable[AnyStr], IO], chunk_size: int = 65536,
+                        overlap: int = 1024, report: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Streaming variant of ``sanitize`` for multi-megabyte exports.
+        
+        Args:
+            source: Iterable of text/bytes chunks, or a file object opened in text or binary mode
+            chunk_size: Maximum number of characters scanned per step
+            overlap: Characters held back at each boundary so matches spanning
+                two chunks are still found (any finding up to this length is exact)
+            report: Optional dict filled with the same summary keys as ``sanitize``
+            
+        Yields:
+            str: Redacted text, in order; concatenated it equals ``sanitize(...)["safe_text"]``
+        """
+        if hasattr(source, "read"):
+            reader = source
+            source = iter(lambda: reader.read(chunk_size), reader.read(0))
+        
+        decoder = None
+        buffer = ""
+        pos = 0  # Everything before pos has already been emitted and is kept only as lookbehind context
+        resume = {}
+        entities_found = set()
+        risk_level = "LOW"
+        scrubbed = False
+        
+        def pieces():
+            nonlocal decoder
+            for chunk in source:
+                if isinstance(chunk, (bytes, bytearray)):
+                    if decoder is None:
+                        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                    chunk = decoder.decode(chunk)
+                for i in range(0, len(chunk), chunk_size):
+                    yield chunk[i:i + chunk_size], False
+            yield (decoder.decode(b"", final=True) if decoder else ""), True
+        
+        for piece, final in pieces():
+            buffer += piece
+            if not final and len(buffer) - pos < chunk_size + overlap:
+                continue
+            
+            raw = []
+            findings = self._scan(buffer, pos, resume=resume, raw=raw)
+            cut = len(buffer) if final else len(buffer) - overlap
+            for f_start, f_end, _, _ in findings:
+                # Never split a finding; hold it back until it is fully inside the window
+                if f_start < cut < f_end:
+                    cut = f_start
+                    break
+            if cut <= pos:
+                continue
+            
+            committed = [f for f in findings if f[1] <= cut]
+            safe_text, chunk_risk = self._redact(buffer, committed, pos, cut, entities_found)
+            scrubbed = scrubbed or bool(committed)
+            if chunk_risk == "HIGH" or (chunk_risk == "MEDIUM" and risk_level == "LOW"):
+                risk_level = chunk_risk
+            if safe_text:
+                yield safe_text
+            
+            context = min(cut, _STREAM_CONTEXT)
+            shift = cut - context
+            # A detector match that started before the cut suppresses that detector until its end
+            carried = {label: end for label, end in resume.items() if end > cut}
+            carried.update((label, end) for start, end, label in raw if start < cut and end > cut)
+            resume = {label: end - shift for label, end in carried.items()}
+            buffer = buffer[shift:]
+            pos = context
+        
+        if report is not None:
+            report.update({
+                "was_scrubbed": scrubbed,
+                "entities_found": list(entities_found),
+                "risk_level": risk_level,
+                "method": "Luhn-Validated Regex v4.0 (streaming)"
+            })
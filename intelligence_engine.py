@@ -1,20 +1,50 @@
 import os
+import time
+import asyncio
 import logging
 from dotenv import load_dotenv
-from litellm import completion
 from compliance_airlock import ComplianceAirlock
 from tribunal_judges import Tribunal
+from semantic_router import SemanticRouter
+from model_pool import ModelPool, load_litellm
+from cache_store import TieredCache, cache_key, normalize_text
+from single_flight import SingleFlight
+from session_store import NO_CONTEXT, Context, SessionStore
+from audit_log import AuditLog
+from telemetry import metrics
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class IntelligenceEngine:
     def __init__(self):
         self.airlock = ComplianceAirlock()
         self.tribunal = Tribunal()
-        self.FAST_MODEL = "openai/gpt-4o-mini" 
-        self.SMART_MODEL = "openai/gpt-4o"
+        profiles_path = os.getenv("ROUTER_PROFILES_PATH") or None
+        self.router = SemanticRouter.from_file(profiles_path)
+        self.FAST_MODEL = self.router.models[self.router.cheapest_tier]
+        self.SMART_MODEL = self.router.models[self.router.priciest_tier]
+        
+        # Upstream calls go through per-model health tracking, fallbacks and (optional) hedging
+        self.pool = ModelPool.from_file(profiles_path)
+        
+        # Completion cache keyed on model + normalized safe_prompt (after redaction,
+        # so prompts that differ only in scrubbed PII share an entry)
+        self.response_cache = TieredCache(
+            "response",
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+            disk_path=os.getenv("RESPONSE_CACHE_PATH") or None,
+            max_disk_entries=int(os.getenv("RESPONSE_CACHE_MAX_DISK_ENTRIES", "100000"))
+        )
+        self.cache_opt_out = {d.strip() for d in os.getenv("RESPONSE_CACHE_OPT_OUT", "").split(",") if d.strip()}
+        self.single_flight = SingleFlight("completion")
+        
+        # Sanitized conversation history per session id, windowed to a token budget
+        self.sessions = SessionStore.from_env()
+        
+        # Append-only record of every decision, written off the request path
+        self.audit = AuditLog.from_env()
         
         # Verify OpenAI key is set
         if not os.getenv("OPENAI_API_KEY"):
@@ -22,21 +52,80 @@ class IntelligenceEngine:
         else:
             logger.info("✅ Intelligence Engine initialized")
 
-    def process(self, prompt: str, user_dept: str = "marketing"):
+    async def warm_up(self, status: dict = None) -> dict:
         """
-        Process a user prompt through the complete governance pipeline.
+        Start-up work done before the first request instead of during it:
+        import litellm, compile the airlock and policy scanners, open pooled
+        provider connections and have Ollama load the judge model.
+        
+        ``status`` (step -> state) is updated as steps finish so a readiness
+        probe can report progress; it is also returned. A failed import or
+        compile raises. Provider and judge warm-up are best-effort and
+        bounded by ``WARMUP_TIMEOUT_SECONDS``: the judge fails open and
+        providers are retried per request anyway.
+        """
+        status = {} if status is None else status
+        timeout = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "60"))
+
+        async def step(name: str, work, required: bool = False):
+            status[name] = "running"
+            started = time.perf_counter()
+            try:
+                outcome = await (work() if required else asyncio.wait_for(work(), timeout))
+            except Exception as e:
+                status[name] = f"failed: {e!r}"
+                if required:
+                    raise
+                logger.warning(f"⚠️ Warm-up step {name} failed: {e!r}")
+                return
+            status[name] = outcome
+            logger.info(f"🔥 Warm-up {name}: {outcome} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+        async def imports():
+            await asyncio.to_thread(load_litellm)
+            return "ok"
+
+        async def patterns():
+            compiled = await asyncio.to_thread(lambda: self.airlock.warm_up() + self.tribunal.policy.warm_up())
+            return f"{compiled} scanners compiled"
+
+        async def imports_then_providers():
+            # Needs litellm, so it follows the import
+            await step("imports", imports, required=True)
+            await step("providers", self.pool.warm_up)
+
+        await asyncio.gather(imports_then_providers(), step("patterns", patterns, required=True),
+                             step("judge", self.tribunal.warm_up))
+        return status
+
+    def route(self, safe_prompt: str, user_dept: str = "marketing"):
+        """
+        Decide which model handles an already-sanitized prompt.
         
-        Args:
-            prompt: User input text
-            user_dept: Department context for routing
-            
         Returns:
-            dict: Complete result with status, output, and metadata
+            tuple: (model, is_complex, savings)
         """
+        # On-device semantic analysis against the tier table (router_profiles.json)
+        decision = self.router.route(safe_prompt, user_dept)
+        is_complex = decision.tier != self.router.cheapest_tier
         
-        # 1. COMPLIANCE SHIELD
-        sanitization = self.airlock.sanitize(prompt)
-        safe_prompt = sanitization["safe_text"]
+        # Savings vs. always using the priciest tier, per avg_tokens of usage
+        # (GPT-4o vs GPT-4o-mini: $0.03/1K vs $0.003/1K = $0.027 saved)
+        return decision.model, is_complex, decision.savings
+
+    def estimate_cost(self, prompt: str, user_dept: str = "marketing") -> float:
+        """Expected provider cost of a prompt, for admission budgets (routing is on-device)."""
+        return self.router.call_cost(self.router.route(prompt, user_dept).model)
+
+    def _admit(self, sanitization: dict, user_dept: str, timings: dict = None):
+        """
+        Apply the compliance decision and route the sanitized prompt.
+        
+        Returns:
+            tuple: (blocked_result or None, model, savings)
+        """
+        for entity in sanitization.get("entities_found", []):
+            metrics.inc("gateway_redactions_total", entity=entity)
         
         # 🛑 HIGH RISK BLOCK (Active Credentials Detected)
         if sanitization.get("risk_level") == "HIGH":
@@ -51,53 +140,107 @@ class IntelligenceEngine:
                 "entities_found": sanitization.get("entities_found", []),
                 "savings": 0.0,
                 "verdict": "FAIL",
+                "risk_level": sanitization.get("risk_level", "LOW"),
                 "sanitization_method": sanitization.get("method", "Unknown")
-            }
+            }, "BLOCKED", 0.0
         
         # ⚠️ MEDIUM RISK ALERT (PII Redacted, continuing)
         if sanitization.get("risk_level") == "MEDIUM":
             logger.warning(f"⚠️ PII Detected & Redacted: {sanitization.get('entities_found')}")
 
         # 2. INTELLIGENT ROUTER
-        # Use semantic analysis to determine complexity
-        is_complex = (
-            user_dept == "engineering" or 
-            any(keyword in safe_prompt.lower() for keyword in ["code", "debug", "algorithm", "function", "script"])
-        )
-        
-        model = self.SMART_MODEL if is_complex else self.FAST_MODEL
-        
-        # Calculate savings (GPT-4o vs GPT-4o-mini)
-        # Assuming ~500 tokens avg: $0.03/1K vs $0.003/1K = $0.027 saved
-        savings = 0.027 if not is_complex else 0.0
+        with metrics.stage("route", timings):
+            model, is_complex, savings = self.route(sanitization["safe_text"], user_dept)
         
         logger.info(f"🧠 Routing to {model} (dept={user_dept}, complex={is_complex})")
+        return None, model, savings
 
-        # 3. LLM EXECUTION
-        try:
-            response = completion(
-                model=model, 
-                messages=[{"role": "user", "content": safe_prompt}],
-                timeout=30
-            )
-            draft = response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"❌ LLM Error: {e}")
-            return {
-                "status": "ERROR", 
-                "output": f"⚠️ API Error: {str(e)}\n\nPlease check your OpenAI API key and try again.",
-                "model_used": model,
-                "safe_prompt": safe_prompt,
-                "pii_scrubbed": sanitization["was_scrubbed"],
-                "entities_found": sanitization.get("entities_found", []),
-                "savings": 0.0,
-                "verdict": "ERROR",
-                "sanitization_method": sanitization.get("method", "Unknown")
-            }
+    def _sanitize(self, prompt: str, history: list = None, session_id: str = None):
+        """
+        Run the airlock over the prompt and whatever earlier turns are new.
+        
+        Returns:
+            tuple: (sanitization report, ``Context`` of earlier turns to send before the prompt)
+        """
+        if not history and not session_id:
+            return self.airlock.sanitize(prompt), NO_CONTEXT
+        return self.sessions.prepare(session_id, history or [], prompt, self.airlock.sanitize)
 
-        # 4. TRIBUNAL VALIDATION
-        verdict = self.tribunal.verify(draft)
+    def _in_session(self, result: dict, session_id: str, context: Context) -> dict:
+        """Report the context used and keep a passed answer as the session's next turn."""
+        if context.messages:
+            result["context"] = {"turns": context.turns, "summarized": context.summarized, "tokens": context.tokens}
+        if session_id and result["status"] == "COMPLETED" and result.get("verdict") == "PASS":
+            self.sessions.record(session_id, "assistant", result["output"])
+        return result
+
+    def _cached_response(self, model: str, savings: float, sanitization: dict, user_dept: str,
+                         context: Context = NO_CONTEXT):
+        """
+        Look the routed request up in the response cache.
         
+        Returns:
+            tuple: (cache key or None when the department opted out, result on a hit or None)
+        """
+        if user_dept in self.cache_opt_out:
+            return None, None
+        # Department and its policy version are part of the key: the same answer can pass one department's
+        # policy and fail another's, or fail a rule added since (and so is the earlier conversation, when there is one)
+        version = self.tribunal.policy.ruleset(user_dept).version
+        parts = [model, user_dept, version, normalize_text(sanitization["safe_text"])]
+        if context.digest:
+            parts.append(context.digest)
+        key = cache_key(*parts)
+        cached = self.response_cache.get(key)
+        if cached is None:
+            return key, None
+        
+        logger.info(f"⚡ Response cache hit ({model})")
+        return key, {
+            "status": "COMPLETED",
+            "output": cached["output"],
+            "model_used": cached.get("model", model),
+            "safe_prompt": sanitization["safe_text"],
+            "pii_scrubbed": sanitization["was_scrubbed"],
+            "entities_found": sanitization.get("entities_found", []),
+            # A hit skips the provider call entirely, so its whole cost is saved too
+            "savings": round(savings + self.router.call_cost(model), 6),
+            "verdict": cached["verdict"],
+            "risk_level": sanitization.get("risk_level", "LOW"),
+            "sanitization_method": sanitization.get("method", "Unknown"),
+            "cache_hit": True
+        }
+
+    def _remember_response(self, key, result: dict):
+        # Only answers the Tribunal passed are worth replaying
+        if key and result["status"] == "COMPLETED" and result["verdict"] == "PASS":
+            self.response_cache.set(key, {"output": result["output"], "verdict": result["verdict"], "model": result["model_used"]})
+
+    def _messages(self, safe_prompt: str, context: Context = NO_CONTEXT) -> list:
+        return context.messages + [{"role": "user", "content": safe_prompt}]
+
+    def _fallback_savings(self, routed: str, answered: str, savings: float) -> float:
+        # A fallback may be pricier (or cheaper) than the routed model
+        if answered == routed:
+            return savings
+        return round(self.router.call_cost(self.SMART_MODEL) - self.router.call_cost(answered), 6)
+
+    def _error_result(self, error: Exception, model: str, sanitization: dict) -> dict:
+        logger.error(f"❌ LLM Error: {error}")
+        return {
+            "status": "ERROR", 
+            "output": f"⚠️ API Error: {str(error)}\n\nPlease check your OpenAI API key and try again.",
+            "model_used": model,
+            "safe_prompt": sanitization["safe_text"],
+            "pii_scrubbed": sanitization["was_scrubbed"],
+            "entities_found": sanitization.get("entities_found", []),
+            "savings": 0.0,
+            "verdict": "ERROR",
+            "risk_level": sanitization.get("risk_level", "LOW"),
+            "sanitization_method": sanitization.get("method", "Unknown")
+        }
+
+    def _final_result(self, draft: str, verdict: dict, model: str, savings: float, sanitization: dict) -> dict:
         # Prepare final output
         if verdict["verdict"] == "PASS":
             final_output = draft
@@ -109,10 +252,223 @@ class IntelligenceEngine:
             "status": "COMPLETED",
             "output": final_output,
             "model_used": model,
-            "safe_prompt": safe_prompt,
+            "safe_prompt": sanitization["safe_text"],
             "pii_scrubbed": sanitization["was_scrubbed"],
             "entities_found": sanitization.get("entities_found", []),
             "savings": savings,
             "verdict": verdict["verdict"],
-            "sanitization_method": sanitization.get("method", "Unknown")
+            "risk_level": sanitization.get("risk_level", "LOW"),
+            "sanitization_method": sanitization.get("method", "Unknown"),
+            "cache_hit": False
         }
+
+    def _observed(self, result: dict, timings: dict, user_dept: str, session_id: str = None) -> dict:
+        """Attach per-stage timings (ms) to a result, count its outcome and audit it."""
+        result["timings_ms"] = timings
+        metrics.inc("gateway_requests_total", status=result["status"], verdict=result.get("verdict", "ERROR"))
+        if result.get("model_used") == "BLOCKED":
+            metrics.inc("gateway_blocks_total", stage="airlock")
+        elif result.get("verdict") == "FAIL":
+            metrics.inc("gateway_blocks_total", stage="tribunal")
+        if self.audit:
+            # Decision metadata only: neither the prompt nor the output is written to disk
+            self.audit.record({
+                "department": user_dept,
+                "session_id": session_id,
+                "status": result["status"],
+                "verdict": result.get("verdict", "ERROR"),
+                "model": result.get("model_used"),
+                "entities": result.get("entities_found", []),
+                "risk_level": result.get("risk_level", "LOW"),
+                "savings": result.get("savings", 0.0),
+                "cache_hit": result.get("cache_hit", False),
+                "timings_ms": dict(timings)
+            })
+        return result
+
+    def process(self, prompt: str, user_dept: str = "marketing", history: list = None, session_id: str = None):
+        """
+        Process a user prompt through the complete governance pipeline.
+        
+        Args:
+            prompt: User input text
+            user_dept: Department context for routing
+            history: Earlier ``{"role", "content"}`` messages, oldest first (optional with a session)
+            session_id: Keeps sanitized turns server-side, so follow-ups only send the new prompt
+            
+        Returns:
+            dict: Complete result with status, output, metadata and ``timings_ms``
+        """
+        timings = {}
+        with metrics.stage("total", timings):
+            result = self._process(prompt, user_dept, history, session_id, timings)
+        return self._observed(result, timings, user_dept, session_id)
+
+    def _process(self, prompt: str, user_dept: str, history: list, session_id: str, timings: dict):
+        # 1. COMPLIANCE SHIELD
+        with metrics.stage("sanitize", timings):
+            sanitization, context = self._sanitize(prompt, history, session_id)
+        blocked, model, savings = self._admit(sanitization, user_dept, timings)
+        if blocked:
+            return blocked
+        with metrics.stage("cache", timings):
+            response_key, cached = self._cached_response(model, savings, sanitization, user_dept, context)
+        if cached:
+            return self._in_session(cached, session_id, context)
+
+        # 3. LLM EXECUTION
+        try:
+            with metrics.stage("upstream", timings):
+                response, answered = self.pool.complete(model, self._messages(sanitization["safe_text"], context))
+            draft = response.choices[0].message.content
+        except Exception as e:
+            return self._error_result(e, model, sanitization)
+        savings = self._fallback_savings(model, answered, savings)
+        model = answered
+
+        # 4. TRIBUNAL VALIDATION
+        with metrics.stage("tribunal", timings):
+            verdict = self.tribunal.verify(draft, user_dept)
+        result = self._final_result(draft, verdict, model, savings, sanitization)
+        self._remember_response(response_key, result)
+        return self._in_session(result, session_id, context)
+
+    async def aprocess(self, prompt: str, user_dept: str = "marketing", history: list = None, session_id: str = None):
+        """
+        Async version of ``process`` for use directly on an event loop.
+        
+        Sanitization is CPU-bound and runs in a worker thread; the provider
+        and judge calls are awaited, so no thread is held while waiting.
+        """
+        timings = {}
+        with metrics.stage("total", timings):
+            result = await self._aprocess(prompt, user_dept, history, session_id, timings)
+        return self._observed(result, timings, user_dept, session_id)
+
+    async def _aprocess(self, prompt: str, user_dept: str, history: list, session_id: str, timings: dict):
+        # 1. COMPLIANCE SHIELD (off the event loop)
+        with metrics.stage("sanitize", timings):
+            sanitization, context = await asyncio.to_thread(self._sanitize, prompt, history, session_id)
+        blocked, model, savings = self._admit(sanitization, user_dept, timings)
+        if blocked:
+            return blocked
+        with metrics.stage("cache", timings):
+            response_key, cached = self._cached_response(model, savings, sanitization, user_dept, context)
+        if cached:
+            return self._in_session(cached, session_id, context)
+
+        # Identical requests already in flight share one provider + judge round trip
+        # (followers report only their own stages plus the total wait)
+        flight_key = (model, sanitization["safe_text"], user_dept, context.digest)
+        result = await self.single_flight.do(
+            flight_key, lambda: self._aexecute(model, savings, sanitization, context, response_key, user_dept, timings)
+        )
+        return self._in_session(dict(result), session_id, context)
+
+    async def _aexecute(self, model: str, savings: float, sanitization: dict, context: Context, response_key,
+                        user_dept: str, timings: dict):
+        # 3. LLM EXECUTION
+        try:
+            with metrics.stage("upstream", timings):
+                response, answered = await self.pool.acomplete(model, self._messages(sanitization["safe_text"], context))
+            draft = response.choices[0].message.content
+        except Exception as e:
+            return self._error_result(e, model, sanitization)
+        savings = self._fallback_savings(model, answered, savings)
+        model = answered
+
+        # 4. TRIBUNAL VALIDATION
+        with metrics.stage("tribunal", timings):
+            verdict = await self.tribunal.averify(draft, user_dept)
+        result = self._final_result(draft, verdict, model, savings, sanitization)
+        self._remember_response(response_key, result)
+        return result
+
+    async def astream(self, prompt: str, user_dept: str = "marketing", history: list = None, session_id: str = None):
+        """
+        Streaming version of ``aprocess``.
+        
+        Yields:
+            dict: ``{"type": "token", "text": ...}`` for every span the Tribunal's
+            stream guard has cleared, then exactly one ``{"type": "result", ...}``
+            carrying the usual result fields. If the guard sees a credential the
+            upstream generation is aborted immediately. The AI judge still reviews
+            the complete draft; a FAIL verdict in the result means the client must
+            replace the streamed text with the result's ``output``.
+        """
+        timings = {}
+        started = time.perf_counter()
+        events = self._astream(prompt, user_dept, history, session_id, timings)
+        try:
+            async for event in events:
+                if event["type"] == "result":
+                    elapsed = time.perf_counter() - started
+                    metrics.observe("gateway_stage_seconds", elapsed, stage="total")
+                    timings["total"] = round(elapsed * 1000, 3)
+                    event = self._observed(event, timings, user_dept, session_id)
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _astream(self, prompt: str, user_dept: str, history: list, session_id: str, timings: dict):
+        # 1. COMPLIANCE SHIELD (off the event loop)
+        with metrics.stage("sanitize", timings):
+            sanitization, context = await asyncio.to_thread(self._sanitize, prompt, history, session_id)
+        blocked, model, savings = self._admit(sanitization, user_dept, timings)
+        if blocked:
+            yield {"type": "result", **blocked}
+            return
+        with metrics.stage("cache", timings):
+            response_key, cached = self._cached_response(model, savings, sanitization, user_dept, context)
+        if cached:
+            yield {"type": "token", "text": cached["output"]}
+            yield {"type": "result", **self._in_session(cached, session_id, context)}
+            return
+
+        # 3. LLM EXECUTION (streamed through the guard)
+        guard = self.tribunal.stream_guard(user_dept)
+        parts = []
+        upstream_started = time.perf_counter()
+        try:
+            # Fallbacks apply until the stream opens; streams are never hedged
+            response, answered = await self.pool.acomplete(
+                model, self._messages(sanitization["safe_text"], context), hedge=False, stream=True
+            )
+            try:
+                async for chunk in response:
+                    token = chunk.choices[0].delta.content or ""
+                    parts.append(token)
+                    cleared = guard.feed(token)
+                    if guard.violated:
+                        break
+                    if cleared:
+                        yield {"type": "token", "text": cleared}
+            finally:
+                # Stop the provider from generating (and billing) the rest
+                close = getattr(response, "aclose", None)
+                if close:
+                    await close()
+        except Exception as e:
+            yield {"type": "result", **self._error_result(e, model, sanitization)}
+            return
+
+        upstream_elapsed = time.perf_counter() - upstream_started
+        metrics.observe("gateway_stage_seconds", upstream_elapsed, stage="upstream")
+        timings["upstream"] = round(upstream_elapsed * 1000, 3)
+        savings = self._fallback_savings(model, answered, savings)
+        model = answered
+        draft = "".join(parts)
+        if guard.violated:
+            logger.error(f"🚨 Streamed output blocked ({guard.issue}), upstream aborted")
+            verdict = {"verdict": "FAIL", "issues": [guard.issue]}
+        else:
+            tail = guard.flush()
+            if tail:
+                yield {"type": "token", "text": tail}
+            # 4. TRIBUNAL VALIDATION (AI judge on the complete draft)
+            with metrics.stage("tribunal", timings):
+                verdict = await self.tribunal.averify(draft, user_dept)
+        
+        result = self._final_result(draft, verdict, model, savings, sanitization)
+        self._remember_response(response_key, result)
+        yield {"type": "result", **self._in_session(result, session_id, context)}
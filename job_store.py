@@ -0,0 +1,167 @@
+import os
+import abc
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Payloads larger than this are zlib-compressed before they are stored
+COMPRESS_THRESHOLD = 1024
+
+
+def _pack(job: Dict) -> bytes:
+    raw = json.dumps(job, separators=(",", ":")).encode("utf-8")
+    if len(raw) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+
+def _unpack(blob: bytes) -> Dict:
+    if blob[:1] == b"z":
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
+
+
+class JobStore(abc.ABC):
+    """
+    Dict-like store for /submit jobs. ``store[job_id] = result`` writes and
+    ``store.get(job_id)`` reads; expired or evicted jobs read as missing.
+    """
+
+    @abc.abstractmethod
+    def __setitem__(self, job_id: str, job: Dict):
+        ...
+
+    @abc.abstractmethod
+    def get(self, job_id: str, default=None) -> Optional[Dict]:
+        ...
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """
+    In-process store with TTL and LRU eviction. Results are kept as compact
+    (optionally compressed) JSON so full LLM outputs don't pin large dicts.
+    """
+
+    def __init__(self, max_jobs: int = 10000, ttl_seconds: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._jobs = OrderedDict()  # job_id -> (expires_at, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __setitem__(self, job_id: str, job: Dict):
+        blob = _pack(job)
+        with self._lock:
+            old = self._jobs.pop(job_id, None)
+            if old:
+                self._bytes -= len(old[1])
+            self._jobs[job_id] = (time.monotonic() + self.ttl_seconds, blob)
+            self._bytes += len(blob)
+            self._evict()
+
+    def get(self, job_id: str, default=None) -> Optional[Dict]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                self._drop(job_id)
+                return default
+            self._jobs.move_to_end(job_id)
+            blob = entry[1]
+        return _unpack(blob)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def _drop(self, job_id: str):
+        _, blob = self._jobs.pop(job_id)
+        self._bytes -= len(blob)
+
+    def _evict(self):
+        now = time.monotonic()
+        # Least recently used entries sit at the front: drop them while expired or over budget
+        while self._jobs:
+            job_id, (expires_at, _) = next(iter(self._jobs.items()))
+            if expires_at >= now and len(self._jobs) <= self.max_jobs and self._bytes <= self.max_bytes:
+                break
+            self._drop(job_id)
+            self.evictions += 1
+
+
+class SQLiteJobStore(JobStore):
+    """
+    On-disk store shared by every ``uvicorn --workers N`` process on a host.
+    WAL mode lets readers in other workers poll /status while one writes.
+    """
+
+    def __init__(self, path: str = "job_store.db", max_jobs: int = 100000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)")
+        logger.info(f"🗄️ SQLite job store at {path} (WAL)")
+
+    def __setitem__(self, job_id: str, job: Dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, expires_at, payload) VALUES (?, ?, ?)",
+                (job_id, time.time() + self.ttl_seconds, _pack(job))
+            )
+            self._writes += 1
+            if self._writes % 256 == 0:
+                self._evict()
+
+    def get(self, job_id: str, default=None) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())
+            ).fetchone()
+        return _unpack(row[0]) if row else default
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_jobs,)
+        )
+
+
+def create_job_store() -> JobStore:
+    """Build the store selected by JOB_STORE_BACKEND (``memory`` or ``sqlite``)."""
+    backend = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("JOB_STORE_TTL_SECONDS", "3600"))
+    max_jobs = int(os.getenv("JOB_STORE_MAX_JOBS", "10000"))
+
+    if backend == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "job_store.db"), max_jobs=max_jobs, ttl_seconds=ttl)
+    return MemoryJobStore(max_jobs=max_jobs, ttl_seconds=ttl,
+                          max_bytes=int(os.getenv("JOB_STORE_MAX_MB", "256")) * 1024 * 1024)
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+Verdict = Dict
+Draft = Hashable  # Whatever the judge needs to see, e.g. (department, text)
+JudgeOne = Callable[[Draft], Awaitable[Verdict]]
+JudgeMany = Callable[[List[Draft]], Awaitable[List[Optional[Verdict]]]]
+
+
+class JudgeScheduler:
+    """
+    Micro-batching front door for the local judge model.
+
+    Concurrent ``submit`` calls are gathered for up to ``batch_window`` seconds
+    (or ``max_batch`` drafts), identical drafts are judged once, and judge
+    calls run under a ``max_concurrency`` cap. In ``"prompt"`` mode a batch of
+    several drafts goes to the judge as one numbered prompt instead.
+
+    ``submit`` returns None whenever the judge is skipped or fails; the
+    caller decides to fail open. ``judge`` also says why: ``circuit_open``,
+    ``queue_budget`` (waited too long for a judge slot), ``error`` or
+    ``no_answer`` (a batched reply that skipped the draft).
+    """
+
+    def __init__(self, judge_one: JudgeOne, judge_many: Optional[JudgeMany] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_concurrency: int = 4, max_batch: int = 8,
+                 batch_window: float = 0.005, queue_budget: float = 2.0, mode: str = "parallel"):
+        self.judge_one = judge_one
+        self.judge_many = judge_many
+        self.breaker = breaker or CircuitBreaker("judge")
+        self.max_concurrency = max_concurrency
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.queue_budget = queue_budget
+        self.mode = mode
+        self.metrics = {
+            "submitted": 0, "batches": 0, "judge_calls": 0, "deduplicated": 0,
+            "failures": 0, "budget_skips": 0, "breaker_skips": 0, "in_flight": 0
+        }
+        self._loop = None
+        self._queue = None
+        self._semaphore = None
+        self._dispatcher = None
+        self._tasks = set()  # Strong references to running batches
+        self._pending: Dict[Draft, asyncio.Future] = {}  # draft -> future of its queued/in-flight judgement
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._pending = {}
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def submit(self, draft: Draft) -> Optional[Verdict]:
+        verdict, _ = await self.judge(draft)
+        return verdict
+
+    async def judge(self, draft: Draft) -> Tuple[Optional[Verdict], str]:
+        """The verdict and "", or None and the reason the judge was skipped."""
+        self.metrics["submitted"] += 1
+        if not self.breaker.allow():
+            self.metrics["breaker_skips"] += 1
+            return None, "circuit_open"
+
+        self._ensure_started()
+        future = self._pending.get(draft)
+        if future is not None:
+            # Same draft already queued or being judged: share that judgement
+            self.metrics["deduplicated"] += 1
+            return await asyncio.shield(future)
+
+        future = self._loop.create_future()
+        self._pending[draft] = future
+        future.add_done_callback(lambda _, key=draft: self._pending.pop(key, None))
+        self._queue.put_nowait((time.monotonic(), draft, future))
+        return await asyncio.shield(future)
+
+    async def _dispatch(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self.metrics["batches"] += 1
+            task = self._loop.create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        try:
+            await self._judge_batch(batch)
+        finally:
+            # Never leave a caller waiting, whatever happened above
+            for _, _, future in batch:
+                self._resolve(future, None, "error")
+
+    async def _judge_batch(self, batch):
+        groups: Dict[Draft, List[asyncio.Future]] = {}
+        enqueued: Dict[Draft, float] = {}
+        for enqueued_at, draft, future in batch:
+            groups.setdefault(draft, []).append(future)
+            enqueued[draft] = min(enqueued.get(draft, enqueued_at), enqueued_at)
+
+        if self.mode == "prompt" and self.judge_many and len(groups) > 1:
+            async with self._semaphore:
+                drafts = self._within_budget(groups, enqueued)
+                verdicts = await self._judge_many(drafts) if drafts else []
+            results = [(draft, verdict, reason) for draft, (verdict, reason) in zip(drafts, verdicts)]
+        else:
+            results = await asyncio.gather(*(self._judge_single(d, enqueued[d], groups) for d in groups))
+            results = [r for r in results if r is not None]
+
+        for draft, verdict, reason in results:
+            for future in groups[draft]:
+                self._resolve(future, verdict, reason)
+
+    def _within_budget(self, groups, enqueued) -> List[Draft]:
+        """Drafts still inside the queue-time budget; the rest fail open right away."""
+        now = time.monotonic()
+        keep = []
+        for draft, enqueued_at in enqueued.items():
+            if now - enqueued_at > self.queue_budget:
+                self.metrics["budget_skips"] += len(groups[draft])
+                for future in groups[draft]:
+                    self._resolve(future, None, "queue_budget")
+            else:
+                keep.append(draft)
+        return keep
+
+    async def _judge_many(self, drafts: List[Draft]) -> List[Tuple[Optional[Verdict], str]]:
+        self.metrics["judge_calls"] += 1
+        self.metrics["in_flight"] += 1
+        try:
+            verdicts = await self.judge_many(drafts)
+        except Exception as e:
+            logger.warning(f"⚠️ Batched judge call failed: {e}")
+            self.metrics["failures"] += 1
+            self.breaker.record_failure()
+            return [(None, "error")] * len(drafts)
+        finally:
+            self.metrics["in_flight"] -= 1
+        self.breaker.record_success()
+        return [(verdict, "" if verdict is not None else "no_answer") for verdict in verdicts]
+
+    async def _judge_single(self, draft: Draft, enqueued_at: float, groups):
+        async with self._semaphore:
+            if not self._within_budget({draft: groups[draft]}, {draft: enqueued_at}):
+                return None
+            self.metrics["judge_calls"] += 1
+            self.metrics["in_flight"] += 1
+            try:
+                verdict, reason = await self.judge_one(draft), ""
+            except Exception as e:
+                logger.warning(f"⚠️ Judge call failed: {e}")
+                self.metrics["failures"] += 1
+                self.breaker.record_failure()
+                verdict, reason = None, "error"
+            else:
+                self.breaker.record_success()
+            finally:
+                self.metrics["in_flight"] -= 1
+        return draft, verdict, reason
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, verdict: Optional[Verdict], reason: str = ""):
+        if not future.done():
+            future.set_result((verdict, reason))
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "breaker": self.breaker.stats()
+        }
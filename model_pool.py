@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from semantic_router import DEFAULT_PROFILES
+
+logger = logging.getLogger(__name__)
+
+
+def load_litellm():
+    """
+    litellm takes seconds to import, so it is loaded on first use (or by
+    the start-up warm-up) instead of when the gateway's modules load.
+    """
+    import litellm
+    return litellm
+
+
+class ModelHealth:
+    """
+    Rolling health of one upstream model: EWMA latency and error rate, a
+    window of recent latencies for percentiles, and its circuit breaker.
+    """
+
+    def __init__(self, model: str, alpha: float = 0.2, window: int = 200,
+                 failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.model = model
+        self.alpha = alpha
+        self.breaker = CircuitBreaker(f"model:{model}", failure_threshold, cooldown_seconds)
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+        self.calls = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float):
+        """Latency sample without an outcome (a hedge loser cancelled after ``latency`` seconds)."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(latency)
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+            )
+            self.ewma_error *= 1 - self.alpha
+        self.breaker.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.ewma_error = self.alpha + (1 - self.alpha) * self.ewma_error
+        self.breaker.record_failure()
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def stats(self) -> Dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error, 4),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "breaker": self.breaker.stats()
+        }
+
+
+class ModelPool:
+    """
+    Upstream model pool with ordered fallbacks.
+
+    Each routed model has a fallback chain (``fallbacks`` per tier in
+    ``router_profiles.json``). Models whose breaker is open are skipped, and a
+    failed call moves on to the next model in the chain. With hedging on, an
+    async call that has not answered within the model's recent p95 latency is
+    raced against the next eligible model; the first answer wins and the
+    loser is cancelled.
+
+    Per-model connection settings (``api_base``, ``api_key_env``, ``timeout``)
+    come from the optional ``endpoints`` table, so the pool can point at
+    local OpenAI-compatible servers.
+    """
+
+    def __init__(self, chains: Dict[str, List[str]], endpoints: Optional[Dict[str, Dict]] = None,
+                 timeout: float = 30.0, hedging: bool = False, hedge_min_delay: float = 0.25,
+                 hedge_min_samples: int = 20, hedge_percentile: float = 95.0,
+                 failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.chains = chains
+        self.endpoints = endpoints or {}
+        self.timeout = timeout
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_percentile = hedge_percentile
+        self._failure_threshold = failure_threshold
+        self._cooldown_seconds = cooldown_seconds
+        self.health: Dict[str, ModelHealth] = {}
+        self.metrics = {"fallbacks": 0, "hedges": 0, "hedge_wins": 0, "exhausted": 0}
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "ModelPool":
+        with open(path or DEFAULT_PROFILES, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+        chains = {
+            tier["model"]: [m for m in tier.get("fallbacks", []) if m != tier["model"]]
+            for tier in profiles["tiers"].values()
+        }
+        return cls(
+            chains,
+            endpoints=profiles.get("endpoints", {}),
+            timeout=float(os.getenv("MODEL_TIMEOUT_SECONDS", "30")),
+            hedging=os.getenv("MODEL_HEDGING", "0").lower() in ("1", "true", "yes"),
+            hedge_min_delay=float(os.getenv("MODEL_HEDGE_MIN_DELAY_SECONDS", "0.25")),
+            hedge_min_samples=int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20")),
+            failure_threshold=int(os.getenv("MODEL_BREAKER_FAILURES", "3")),
+            cooldown_seconds=float(os.getenv("MODEL_BREAKER_COOLDOWN_SECONDS", "30"))
+        )
+
+    def _health(self, model: str) -> ModelHealth:
+        health = self.health.get(model)
+        if health is None:
+            health = self.health.setdefault(
+                model, ModelHealth(model, failure_threshold=self._failure_threshold,
+                                   cooldown_seconds=self._cooldown_seconds)
+            )
+        return health
+
+    def chain(self, model: str) -> List[str]:
+        return [model] + self.chains.get(model, [])
+
+    def request(self, model: str, messages: List[Dict], **extra) -> Dict[str, Any]:
+        """litellm keyword arguments for one call to ``model``."""
+        endpoint = dict(self.endpoints.get(model, {}))
+        key_env = endpoint.pop("api_key_env", None)
+        if key_env:
+            endpoint["api_key"] = os.getenv(key_env)
+        return {"model": model, "messages": messages, "timeout": self.timeout, **endpoint, **extra}
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """How long to wait on ``model`` before hedging; None until there is enough history."""
+        health = self._health(model)
+        if health.samples() < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, health.percentile(self.hedge_percentile))
+
+    def complete(self, model: str, messages: List[Dict], **extra) -> Tuple[Any, str]:
+        """
+        Blocking completion through the fallback chain (no hedging).
+
+        Returns:
+            tuple: (litellm response, model that answered)
+        """
+        last_error = None
+        for index, candidate in enumerate(self.chain(model)):
+            health = self._health(candidate)
+            if not health.breaker.allow():
+                continue
+            if index:
+                self.metrics["fallbacks"] += 1
+            started = time.perf_counter()
+            try:
+                response = load_litellm().completion(**self.request(candidate, messages, **extra))
+            except Exception as e:
+                logger.warning(f"⚠️ {candidate} failed: {e}")
+                health.record_failure()
+                last_error = e
+                continue
+            health.record_success(time.perf_counter() - started)
+            return response, candidate
+        self._exhausted(model, last_error)
+
+    async def acomplete(self, model: str, messages: List[Dict], hedge: Optional[bool] = None,
+                        **extra) -> Tuple[Any, str]:
+        """
+        Async completion through the fallback chain, hedged if enabled.
+
+        Returns:
+            tuple: (litellm response, model that answered)
+        """
+        hedge = self.hedging if hedge is None else hedge
+        candidates = iter(self.chain(model))
+        running: Dict[asyncio.Task, Tuple[str, float, bool]] = {}  # task -> (model, started, is_hedge)
+        last_error = None
+        attempts = 0
+
+        def launch(is_hedge: bool = False) -> bool:
+            nonlocal attempts
+            for candidate in candidates:
+                if not self._health(candidate).breaker.allow():
+                    continue
+                if attempts and not is_hedge:
+                    self.metrics["fallbacks"] += 1
+                attempts += 1
+                task = asyncio.ensure_future(load_litellm().acompletion(**self.request(candidate, messages, **extra)))
+                running[task] = (candidate, time.perf_counter(), is_hedge)
+                return True
+            return False
+
+        try:
+            launch()
+            while running:
+                delay = None
+                if hedge and len(running) == 1:
+                    delay = self.hedge_delay(next(iter(running.values()))[0])
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than its own p95: race the next eligible model
+                    hedge = False
+                    if launch(is_hedge=True):
+                        self.metrics["hedges"] += 1
+                        logger.info(f"🏁 Hedging slow {model} call")
+                    continue
+                for task in done:
+                    candidate, started, is_hedge = running.pop(task)
+                    health = self._health(candidate)
+                    error = task.exception()
+                    if error is None:
+                        health.record_success(time.perf_counter() - started)
+                        if is_hedge:
+                            self.metrics["hedge_wins"] += 1
+                        return task.result(), candidate
+                    logger.warning(f"⚠️ {candidate} failed: {error}")
+                    health.record_failure()
+                    last_error = error
+                if not running:
+                    launch()
+        finally:
+            for task, (candidate, started, _) in running.items():
+                task.cancel()
+                # A cancelled loser has no outcome, but its time so far keeps the p95 honest;
+                # and it must not keep holding a half-open probe
+                health = self._health(candidate)
+                health.observe(time.perf_counter() - started)
+                health.breaker.release()
+        self._exhausted(model, last_error)
+
+    def _exhausted(self, model: str, last_error: Optional[Exception]):
+        self.metrics["exhausted"] += 1
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError(f"No healthy upstream for {model} (all circuits open)")
+
+    async def warm_up(self, timeout: float = 10.0) -> str:
+        """
+        Give litellm one shared keep-alive connection pool and open a
+        connection to every OpenAI-compatible endpoint in the chains, so the
+        first request does not pay for DNS, TCP and TLS. Must run on the
+        event loop that will serve requests.
+        """
+        import httpx
+
+        litellm = load_litellm()
+        if litellm.aclient_session is None:
+            litellm.aclient_session = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("MODEL_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("MODEL_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("MODEL_KEEPALIVE_SECONDS", "120"))
+                )
+            )
+        client = litellm.aclient_session
+
+        bases = {}
+        for model in {m for head, chain in self.chains.items() for m in [head] + chain}:
+            if model.startswith("ollama/"):
+                continue  # Local, nothing to handshake with
+            endpoint = self.endpoints.get(model, {})
+            base = endpoint.get("api_base") or os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1"
+            bases[base.rstrip("/")] = os.getenv(endpoint.get("api_key_env") or "OPENAI_API_KEY", "")
+
+        async def connect(base: str, key: str) -> bool:
+            try:
+                # Any HTTP answer (even 401/404) leaves a pooled connection behind
+                await client.get(f"{base}/models", headers={"Authorization": f"Bearer {key}"} if key else {},
+                                 timeout=timeout)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"⚠️ Warm-up could not reach {base}: {e!r}")
+                return False
+
+        connected = await asyncio.gather(*(connect(base, key) for base, key in bases.items()))
+        return f"{sum(connected)}/{len(connected)} endpoints connected"
+
+    def stats(self) -> Dict:
+        return {**self.metrics, "models": {m: h.stats() for m, h in self.health.items()}}
@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy.json")
+
+BLOCK = "block"
+REVIEW = "review"
+
+
+class PolicyDecision(NamedTuple):
+    blocked: Optional[str]  # Reason of the first blocking rule hit, if any
+    review: List[str]       # Rule ids that make the draft worth the judge's time
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """
+    One regex for a set of phrases, factored into a trie so shared prefixes
+    are tried once (``Project Orion|Project Osprey`` -> ``Project\\ O(?:rion|sprey)``).
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term.casefold():
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        if list(node) == [""]:
+            return ""
+        branches, optional = [], "" in node
+        for char in sorted(k for k in node if k):
+            branches.append(re.escape(char) + build(node[char]))
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            body = "(?:" + body + ")?"
+        return body
+
+    return r"\b" + build(trie) + r"\b"
+
+
+class RuleSet:
+    """
+    The compiled rules for one department (global rules included).
+
+    Each rule has literal triggers (its terms, or the ``triggers`` listed
+    for a pattern rule); a rule whose triggers are all absent from the
+    lowercased draft is skipped without running any regex. The rules that
+    remain are scanned with one combined regex per action, each rule a
+    named group, cached per set of active rules.
+    """
+
+    def __init__(self, rules: List[Dict], guidelines: List[str]):
+        self.guidelines = guidelines
+        self.version = hashlib.sha256(json.dumps([rules, guidelines], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self._rules: List[Tuple[str, str, str, str, str, Optional[Tuple[str, ...]]]] = []
+        self._scanners: Dict[Tuple[str, Tuple[int, ...]], Optional[re.Pattern]] = {}
+
+        for index, rule in enumerate(rules):
+            rule_id = rule.get("id", f"rule-{index}")
+            action = rule.get("action", BLOCK)
+            if action not in (BLOCK, REVIEW):
+                raise ValueError(f"Rule {rule_id}: unknown action '{action}'")
+            if rule.get("terms"):
+                pattern = _trie_pattern(rule["terms"])
+                triggers = rule["terms"]
+            elif rule.get("pattern"):
+                pattern = rule["pattern"]
+                re.compile(pattern)  # Fail on the offending rule, not on the combined pattern
+                triggers = rule.get("triggers")
+            else:
+                raise ValueError(f"Rule {rule_id}: needs 'terms' or 'pattern'")
+            triggers = tuple(t.lower() for t in triggers) if triggers else None
+            self._rules.append((f"r{index}", rule_id, action, pattern, rule.get("reason", rule_id), triggers))
+
+        self._groups = {group: (rule_id, reason) for group, rule_id, _, _, reason, _ in self._rules}
+
+    def _scanner(self, action: str, active: Tuple[int, ...]) -> Optional[re.Pattern]:
+        key = (action, active)
+        if key in self._scanners:
+            return self._scanners[key]
+        if len(self._scanners) > 256:
+            self._scanners.clear()
+        parts = [f"(?P<{self._rules[i][0]}>{self._rules[i][3]})" for i in active if self._rules[i][2] == action]
+        scanner = self._scanners[key] = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+        return scanner
+
+    def warm_up(self) -> int:
+        """Compile the scanners for drafts that trigger no rule or a single one."""
+        always = tuple(i for i, rule in enumerate(self._rules) if rule[5] is None)
+        triggered = [i for i, rule in enumerate(self._rules) if rule[5] is not None]
+        for active in [always] + [tuple(sorted(always + (i,))) for i in triggered]:
+            if active:
+                self._scanner(BLOCK, active)
+                self._scanner(REVIEW, active)
+        return len(self._scanners)
+
+    def _active(self, draft: str) -> Tuple[int, ...]:
+        lowered = draft.lower()
+        return tuple(
+            i for i, rule in enumerate(self._rules)
+            if rule[5] is None or any(t in lowered for t in rule[5])
+        )
+
+    def _blocked(self, draft: str, active: Tuple[int, ...]) -> Optional[str]:
+        block = self._scanner(BLOCK, active)
+        match = block.search(draft) if block else None
+        return self._groups[match.lastgroup][1] if match else None
+
+    def blocked(self, draft: str) -> Optional[str]:
+        """Block rules only: the reason of the first hit, or None. Cheap enough to run per streamed token."""
+        active = self._active(draft)
+        return self._blocked(draft, active) if active else None
+
+    def evaluate(self, draft: str) -> PolicyDecision:
+        active = self._active(draft)
+        if not active:
+            return PolicyDecision(None, [])
+        blocked = self._blocked(draft, active)
+        if blocked:
+            return PolicyDecision(blocked, [])
+        review = self._scanner(REVIEW, active)
+        if not review:
+            return PolicyDecision(None, [])
+        return PolicyDecision(None, sorted({self._groups[m.lastgroup][0] for m in review.finditer(draft)}))
+
+
+class PolicyEngine:
+    """
+    Loads ``policy.json`` into one compiled ``RuleSet`` per department and
+    recompiles it when the file's mtime changes (checked at most every
+    ``check_interval`` seconds). A broken edit is logged and the last good
+    rules stay in force.
+
+    Each department maps to ``{"guidelines": [...], "rules": [...]}`` (a
+    bare list is read as guidelines only). ``global`` applies everywhere.
+    A rule has an ``id``, an ``action`` (``block`` or ``review``), a
+    ``reason``, and either ``terms`` (phrases, matched case-insensitively
+    on word boundaries) or a regex ``pattern``. A pattern rule may list
+    ``triggers``: lowercase substrings at least one of which any match
+    must contain, so drafts without them skip the regex.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 1.0):
+        self.path = path or DEFAULT_POLICY
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._rulesets: Dict[str, RuleSet] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "r", encoding="utf-8") as f:
+                rulesets = self._compile(json.load(f))
+        except FileNotFoundError:
+            if self._mtime is None:
+                logger.warning(f"⚠️ No policy file at {self.path}, department rules disabled")
+                self._mtime = 0
+            return
+        except (OSError, ValueError, re.error) as e:
+            logger.error(f"❌ Policy reload failed, keeping previous rules: {e}")
+            self._mtime = os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else self._mtime
+            return
+        self._rulesets, self._mtime = rulesets, mtime
+        self.reloads += 1
+        logger.info(f"📜 Policy compiled: {len(rulesets)} rule sets from {self.path}")
+
+    @staticmethod
+    def _section(value) -> Tuple[List[str], List[Dict]]:
+        if isinstance(value, list):
+            return value, []
+        return value.get("guidelines", []), value.get("rules", [])
+
+    def _compile(self, policy: Dict) -> Dict[str, RuleSet]:
+        global_guidelines, global_rules = self._section(policy.get("global", []))
+        rulesets = {"global": RuleSet(global_rules, global_guidelines)}
+        for department, value in policy.items():
+            if department == "global":
+                continue
+            guidelines, rules = self._section(value)
+            rulesets[department] = RuleSet(global_rules + rules, global_guidelines + guidelines)
+        return rulesets
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return
+            if mtime != self._mtime:
+                self._load()
+
+    def ruleset(self, department: str) -> RuleSet:
+        self._maybe_reload()
+        rulesets = self._rulesets
+        return rulesets.get(department) or rulesets.get("global") or RuleSet([], [])
+
+    def evaluate(self, draft: str, department: str) -> PolicyDecision:
+        return self.ruleset(department).evaluate(draft)
+
+    def warm_up(self) -> int:
+        return sum(ruleset.warm_up() for ruleset in self._rulesets.values())
+
+    def departments(self) -> List[str]:
+        return sorted(self._rulesets)
@@ -2,10 +2,21 @@
 echo "🛡️  Starting Sovereign AI Gateway..."
 
 export OLLAMA_HOST=127.0.0.1:11434
+API_URL=http://localhost:8000
+
+# wait_for URL SECONDS: poll until the URL answers 2xx, instead of sleeping and hoping
+wait_for() {
+    local deadline=$((SECONDS + $2))
+    until curl -sf "$1" > /dev/null 2>&1; do
+        [ $SECONDS -ge $deadline ] && return 1
+        sleep 0.2
+    done
+}
+
 if ! pgrep -x "ollama" > /dev/null; then
     echo "🧠 Starting Ollama..."
     ollama serve > /dev/null 2>&1 &
-    sleep 3
+    wait_for "http://$OLLAMA_HOST/api/tags" 30 || echo "⚠️  Ollama not answering yet; the Tribunal fails open until it is."
 else
     echo "✅ Ollama is already running."
 fi
@@ -21,12 +32,18 @@ fi
 echo "🍳 Starting API Server..."
 uvicorn api_server:app --port 8000 > /dev/null 2>&1 &
 PID_API=$!
-sleep 2
+if ! wait_for "$API_URL/livez" 30; then
+    echo "❌ API did not start. Run 'uvicorn api_server:app --port 8000' to see why."
+    kill $PID_API 2>/dev/null
+    exit 1
+fi
 
 echo "🍽️  Starting UI..."
 streamlit run ui_frontend.py &
 PID_UI=$!
 
+# The UI starts while the API warms up (imports, judge model, provider connections)
+wait_for "$API_URL/readyz" 120 || echo "⚠️  API still warming up; see $API_URL/readyz"
 echo "🚀 System Online at http://localhost:8501"
 echo "Press CTRL+C to stop."
 
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import zlib
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_profiles.json")
+
+_TOKEN = re.compile(r"[a-z0-9_+#]+")
+
+
+class RouteDecision(NamedTuple):
+    tier: str
+    model: str
+    score: float
+    scores: Dict[str, float]
+    savings: float
+
+
+class HashedNgramEncoder:
+    """
+    Training-free text embedding: word unigrams/bigrams plus character
+    n-grams of every word, hashed (with a sign bit) into a fixed-size vector.
+    Only the first ``max_chars`` characters are encoded; that is plenty to
+    judge the kind of task and keeps routing O(1) for huge pastes.
+    """
+
+    def __init__(self, dim: int = 4096, char_ngrams=(3, 4), max_chars: int = 4000):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.max_chars = max_chars
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text[:self.max_chars].lower())
+        features = [f"w:{w}" for w in words]
+        features.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            for n in self.char_ngrams:
+                features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def encode(self, text: str) -> np.ndarray:
+        features = self._features(text)
+        if not features:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        counts = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        # Sublinear term frequency, then unit length so a dot product is a cosine
+        vector = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self.encode(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+
+class SemanticRouter:
+    """
+    On-device router: prompts are embedded with ``HashedNgramEncoder`` and
+    scored against per-tier centroids built once from the example prompts
+    in the tier table (``router_profiles.json``). No network, no GPU.
+
+    A pricier tier only wins when it is a confident match: its score must
+    reach ``min_score`` and beat the runner-up by ``min_margin``. Prompts
+    that look like no tier in particular (greetings, one-word tests) go to
+    the cheapest tier.
+    """
+
+    def __init__(self, profiles: Dict, encoder: Optional[HashedNgramEncoder] = None):
+        self.encoder = encoder or HashedNgramEncoder()
+        self.tiers = list(profiles["tiers"])
+        self.models = {name: tier["model"] for name, tier in profiles["tiers"].items()}
+        self.costs = {name: float(tier.get("cost_per_1k_tokens", 0.0)) for name, tier in profiles["tiers"].items()}
+        self.avg_tokens = float(profiles.get("avg_tokens", 1000))
+        self.department_bias = profiles.get("department_bias", {})
+        self.min_score = float(profiles.get("min_score", 0.0))
+        self.min_margin = float(profiles.get("min_margin", 0.0))
+        self.cheapest_tier = min(self.tiers, key=lambda t: self.costs[t])
+        self.priciest_tier = max(self.tiers, key=lambda t: self.costs[t])
+
+        # Precompute one unit-length centroid per tier
+        centroids = []
+        for name in self.tiers:
+            vectors = self.encoder.encode_batch(profiles["tiers"][name]["examples"])
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+        self.centroids = np.vstack(centroids).astype(np.float32)
+
+        logger.info(f"🧭 Semantic Router ready: {len(self.tiers)} tiers ({', '.join(self.tiers)})")
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "SemanticRouter":
+        with open(path or DEFAULT_PROFILES, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def call_cost(self, model: str) -> float:
+        """Estimated cost of one ``avg_tokens`` call to ``model`` (0.0 if the model is not in the table)."""
+        for name, tier_model in self.models.items():
+            if tier_model == model:
+                return self.costs[name] * self.avg_tokens / 1000
+        return 0.0
+
+    def _bias(self, department: str) -> np.ndarray:
+        bias = self.department_bias.get(department, {})
+        return np.array([bias.get(name, 0.0) for name in self.tiers], dtype=np.float32)
+
+    def _decide(self, scores: np.ndarray) -> RouteDecision:
+        ranked = np.argsort(scores)[::-1]
+        best = self.tiers[int(ranked[0])]
+        if best != self.cheapest_tier:
+            margin = scores[ranked[0]] - scores[ranked[1]] if len(ranked) > 1 else scores[ranked[0]]
+            if scores[ranked[0]] < self.min_score or margin < self.min_margin:
+                best = self.cheapest_tier
+        savings = (self.costs[self.priciest_tier] - self.costs[best]) * self.avg_tokens / 1000
+        return RouteDecision(
+            tier=best,
+            model=self.models[best],
+            score=float(scores[self.tiers.index(best)]),
+            scores={name: round(float(s), 4) for name, s in zip(self.tiers, scores)},
+            savings=round(savings, 6)
+        )
+
+    def route(self, text: str, department: str = "marketing") -> RouteDecision:
+        scores = self.centroids @ self.encoder.encode(text) + self._bias(department)
+        return self._decide(scores)
+
+    def route_batch(self, texts: List[str], departments: Optional[List[str]] = None) -> List[RouteDecision]:
+        """Score many prompts with one matrix product."""
+        scores = self.encoder.encode_batch(texts) @ self.centroids.T
+        departments = departments or ["marketing"] * len(texts)
+        scores += np.vstack([self._bias(d) for d in departments]) if texts else 0
+        return [self._decide(row) for row in scores]
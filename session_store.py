@@ -0,0 +1,280 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing the chat APIs add on top of the content (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_SENTENCE = re.compile(r"\S.*?(?:[.!?](?=\s|$)|$)", re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English, plus the
+    per-message framing). The budget is a guard against oversized requests,
+    not a bill, so no tokenizer is loaded for it.
+    """
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def _digest(role: str, content: str) -> str:
+    return hashlib.sha256(f"{role}\x00{content}".encode("utf-8")).hexdigest()[:32]
+
+
+class Turn(NamedTuple):
+    role: str
+    content: str               # Sanitized text; the raw message is never kept
+    tokens: int                # Counted once, when the turn is stored
+    digest: str                # Of the raw message, to recognise it when a client resends it
+    entities: Tuple[str, ...]
+    risk_level: str
+    was_scrubbed: bool
+    method: str
+
+
+class Context(NamedTuple):
+    messages: List[Dict[str, str]]  # Rolling summary (if any) + the most recent turns that fit
+    digest: str                     # "" when there is no earlier context
+    turns: int                      # Earlier turns sent verbatim
+    summarized: int                 # Earlier turns only present in the summary
+    tokens: int                     # Estimated tokens of the whole upstream request
+
+
+NO_CONTEXT = Context([], "", 0, 0, 0)
+
+
+class Session:
+    def __init__(self, session_id: Optional[str]):
+        self.id = session_id
+        self.turns: List[Turn] = []
+        self.known: Dict[str, Turn] = {}  # digest -> turn, so a rewritten history is not re-scanned
+        self.summary_lines: List[str] = []
+        self.summary_upto = 0             # Turns [0, summary_upto) are folded into the summary
+        self.summary: Optional[Tuple[str, int]] = None  # (text, tokens), rebuilt only when it grows
+        self.lock = threading.Lock()
+        self.expires_at = 0.0
+
+
+class SessionStore:
+    """
+    Server-side conversation history, keyed by the client's session id.
+
+    Turns are stored sanitized, each with its token count, so a follow-up
+    only pays for the airlock on messages the session has not seen. Clients
+    may send just the new message or their whole history: the stored tail
+    is matched against what was sent and only the remainder is scanned. A
+    history that no longer matches (edited, or sent to a worker that has
+    never seen the session) replaces the stored one, reusing any turn whose
+    raw text is already known.
+
+    ``prepare`` builds the upstream context within ``max_context_tokens``:
+    the most recent earlier turns that fit go verbatim, older ones are
+    folded into a rolling extractive summary that is extended, never
+    rebuilt, as the window moves. Without a session id the same is done
+    for the history in the request, without keeping anything.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600, max_context_tokens: int = 3000,
+                 summary_tokens: int = 400, summary_line_chars: int = 200):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_context_tokens = max_context_tokens
+        self.summary_tokens = summary_tokens
+        self.summary_line_chars = summary_line_chars
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.sanitized_turns = 0
+        self.reused_turns = 0
+        self.summarized_turns = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "3600")),
+            max_context_tokens=int(os.getenv("SESSION_CONTEXT_TOKENS", "3000")),
+            summary_tokens=int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+        )
+
+    def _session(self, session_id: Optional[str]) -> Session:
+        if not session_id:
+            return Session(None)
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.expires_at < now:
+                session = self._sessions[session_id] = Session(session_id)
+            self._sessions.move_to_end(session_id)
+            session.expires_at = now + self.ttl_seconds
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _turn(self, session: Session, role: str, content: str, sanitize: Callable[[str], Dict]) -> Turn:
+        digest = _digest(role, content)
+        turn = session.known.get(digest)
+        if turn is not None:
+            self.reused_turns += 1
+            metrics.inc("gateway_session_turns_total", result="reused")
+            return turn
+        report = sanitize(content)
+        self.sanitized_turns += 1
+        metrics.inc("gateway_session_turns_total", result="sanitized")
+        return Turn(role, report["safe_text"], count_tokens(report["safe_text"]), digest,
+                    tuple(report.get("entities_found", [])), report.get("risk_level", "LOW"),
+                    report.get("was_scrubbed", False), report.get("method", "Unknown"))
+
+    @staticmethod
+    def _overlap(stored: Sequence[Turn], digests: List[str]) -> Optional[int]:
+        """
+        How many leading ``digests`` are the tail of ``stored``: the client
+        resent (part of) the history the session already holds. ``None``
+        when the sent history does not line up with it.
+        """
+        if not digests:
+            return 0
+        if not stored:
+            return None
+        for start in range(max(0, len(stored) - len(digests)), len(stored)):
+            if stored[start].digest == digests[0] and all(
+                    turn.digest == digest for turn, digest in zip(stored[start:], digests)):
+                return len(stored) - start
+        return None
+
+    def prepare(self, session_id: Optional[str], history: List[Dict[str, str]], prompt: str,
+                sanitize: Callable[[str], Dict]) -> Tuple[Dict, Context]:
+        """
+        Sanitize whatever is new in ``history`` + ``prompt`` and build the
+        upstream context for ``prompt``.
+
+        Returns:
+            tuple: (sanitization report for the new turns in the shape of
+            ``ComplianceAirlock.sanitize``, with the prompt's ``safe_text``;
+            the ``Context`` to send before it). On a HIGH risk report nothing
+            is stored and the context is empty.
+        """
+        session = self._session(session_id)
+        with session.lock:
+            sent = [(m.get("role", "user"), m.get("content") or "") for m in history]
+            sent_digests = [_digest(role, content) for role, content in sent]
+            overlap = self._overlap(session.turns, sent_digests)
+            if overlap is None:
+                turns, new = [], sent  # The client's history wins
+            else:
+                turns, new = list(session.turns), sent[overlap:]
+
+            added = [self._turn(session, role, content, sanitize) for role, content in new]
+            added.append(self._turn(session, "user", prompt, sanitize))
+            report = self._report(added)
+            if report["risk_level"] == "HIGH":
+                return report, NO_CONTEXT
+
+            if overlap is None and session.turns:
+                logger.info(f"🧵 Session {session.id}: history rewritten by client, rebuilding")
+                session.summary_lines, session.summary_upto, session.summary = [], 0, None
+            session.turns = turns + added
+            for turn in added:
+                session.known[turn.digest] = turn
+            return report, self._window(session)
+
+    def record(self, session_id: Optional[str], role: str, content: str):
+        """Store a gateway-produced turn (already safe) so the next request can build on it."""
+        if not session_id:
+            return
+        session = self._session(session_id)
+        with session.lock:
+            turn = Turn(role, content, count_tokens(content), _digest(role, content), (), "LOW", False, "Gateway")
+            session.turns.append(turn)
+            session.known[turn.digest] = turn
+
+    @staticmethod
+    def _report(added: List[Turn]) -> Dict:
+        prompt = added[-1]
+        risks = {turn.risk_level for turn in added}
+        return {
+            "safe_text": prompt.content,
+            "was_scrubbed": any(turn.was_scrubbed for turn in added),
+            "entities_found": sorted({entity for turn in added for entity in turn.entities}),
+            "risk_level": "HIGH" if "HIGH" in risks else "MEDIUM" if "MEDIUM" in risks else "LOW",
+            "method": prompt.method
+        }
+
+    def _window(self, session: Session) -> Context:
+        """Pick the earlier turns for the current prompt (the last turn) within the token budget."""
+        turns = session.turns
+        prompt = turns[-1]
+        available = self.max_context_tokens - prompt.tokens
+        earlier = len(turns) - 1
+        floor = session.summary_upto  # Once summarized, a turn is never sent verbatim again
+
+        total = sum(turn.tokens for turn in turns[floor:earlier])
+        if floor == 0 and total <= available:
+            start = 0
+        else:
+            # Leave room for the summary, then walk back from the newest turn
+            room = available - self.summary_tokens
+            start, used = earlier, 0
+            while start > floor and used + turns[start - 1].tokens <= room:
+                start -= 1
+                used += turns[start].tokens
+        if start > floor:
+            self._fold(session, start)
+
+        messages = []
+        tokens = prompt.tokens
+        if session.summary:
+            text, summary_tokens = session.summary
+            messages.append({"role": "system", "content": text})
+            tokens += summary_tokens
+        for turn in turns[start:earlier]:
+            messages.append({"role": turn.role, "content": turn.content})
+            tokens += turn.tokens
+        if not messages:
+            return Context([], "", 0, 0, tokens)
+        digest = hashlib.sha256()
+        if session.summary:
+            digest.update(session.summary[0].encode("utf-8"))
+        for turn in turns[start:earlier]:
+            digest.update(turn.digest.encode("ascii"))
+        return Context(messages, digest.hexdigest(), earlier - start, session.summary_upto, tokens)
+
+    def _fold(self, session: Session, upto: int):
+        """Extend the rolling summary with turns [summary_upto, upto); the oldest lines go first when it is full."""
+        for turn in session.turns[session.summary_upto:upto]:
+            match = _SENTENCE.search(turn.content)
+            line = _WHITESPACE.sub(" ", match.group(0) if match else "").strip()
+            if len(line) > self.summary_line_chars:
+                line = line[:self.summary_line_chars - 1].rstrip() + "…"
+            if line:
+                session.summary_lines.append(f"- {turn.role}: {line}")
+        self.summarized_turns += upto - session.summary_upto
+        session.summary_upto = upto
+
+        header = "Summary of the earlier conversation:"
+        lines = session.summary_lines
+        while lines and count_tokens("\n".join([header] + lines)) > self.summary_tokens:
+            lines.pop(0)
+        text = "\n".join([header] + lines)
+        session.summary = (text, count_tokens(text))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "sanitized_turns": self.sanitized_turns,
+            "reused_turns": self.reused_turns,
+            "summarized_turns": self.summarized_turns
+        }
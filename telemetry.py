@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Prometheus-style latency buckets (seconds), sub-millisecond regex work up to slow upstreams
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """
+    Cumulative buckets for Prometheus plus a window of recent samples for
+    p50/p95/p99 (exact over the window, cheap to keep).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] for q in QUANTILES}
+
+
+class Metrics:
+    """
+    Process-wide counters, histograms and gauge callbacks, rendered in the
+    Prometheus text format by ``render()``. Thread-safe; sanitization runs
+    in worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], **labels):
+        """Register a gauge whose value is read at scrape time."""
+        key = _labels(labels)
+        previous = self._gauges.get(name)
+        self._gauges[name] = lambda: {**(previous() if previous else {}), key: read()}
+        self._help.setdefault(name, ("gauge", help_text))
+
+    def gauge_family(self, name: str, help_text: str, label: str, read: Callable[[], Dict[str, Optional[float]]]):
+        """Register gauges with one series per ``label`` value, as mapped by ``read`` at scrape time (None skips)."""
+        previous = self._gauges.get(name)
+        self._gauges[name] = lambda: {
+            **(previous() if previous else {}),
+            **{_labels({label: k}): v for k, v in read().items() if v is not None}
+        }
+        self._help.setdefault(name, ("gauge", help_text))
+
+    @contextmanager
+    def stage(self, name: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        """Time a pipeline stage into ``gateway_stage_seconds`` and, if given, a per-request dict (ms)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe("gateway_stage_seconds", elapsed, stage=name)
+            if timings is not None:
+                timings[name] = round(timings.get(name, 0.0) + elapsed * 1000, 3)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def snapshot(self) -> Dict:
+        """JSON-friendly view: counters plus count/p50/p95/p99 (ms) per histogram series."""
+        with self._lock:
+            counters = {
+                name: {_format_labels(k) or "total": v for k, v in series.items()}
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: {
+                    _format_labels(k) or "all": {
+                        "count": h.count,
+                        **{f"p{int(q * 100)}_ms": round(v * 1000, 3) for q, v in h.quantiles().items()}
+                    }
+                    for k, h in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, default_kind: str):
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.extend(f"{name}{_format_labels(k)} {v:g}" for k, v in sorted(series.items()))
+
+            for name, series in sorted(self._histograms.items()):
+                header(name, "histogram")
+                quantile_lines = []
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+                    quantile_lines.extend(
+                        f"{name}_window{_format_labels(key, ('quantile', f'{q:g}'))} {v:.6f}"
+                        for q, v in h.quantiles().items()
+                    )
+                lines.append(f"# HELP {name}_window Recent-window quantiles of {name}")
+                lines.append(f"# TYPE {name}_window gauge")
+                lines.extend(quantile_lines)
+
+        for name, read in sorted(self._gauges.items()):
+            header(name, "gauge")
+            lines.extend(f"{name}{_format_labels(k)} {v:g}" for k, v in sorted(read().items()))
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("gateway_stage_seconds", "histogram", "Time spent in each pipeline stage")
+metrics.describe("gateway_requests_total", "counter", "Completed requests by status and verdict")
+metrics.describe("gateway_blocks_total", "counter", "Requests blocked, by the stage that blocked them")
+metrics.describe("gateway_redactions_total", "counter", "Prompts with a redacted entity, by entity type")
+metrics.describe("gateway_cache_lookups_total", "counter", "Cache lookups by cache and result")
+metrics.describe("gateway_policy_hits_total", "counter", "Drafts matched by a policy.json rule, by action and department")
+metrics.describe("gateway_session_turns_total", "counter", "Conversation turns sanitized, or reused from the session store")
+metrics.describe("gateway_audit_records_total", "counter", "Audit log records written, or dropped when the writer fell behind")
+metrics.describe("gateway_judge_fail_open_total", "counter", "Drafts passed without an AI verdict, by reason")
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    One logging setup for the whole gateway, called by entry points
+    (API server, CLIs). ``LOG_LEVEL`` (default INFO) and ``LOG_FORMAT``
+    (``text`` or ``json``) configure it.
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(_JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
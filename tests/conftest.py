@@ -0,0 +1,17 @@
+import os
+import sys
+import logging
+
+import pytest
+
+# The gateway modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compliance_airlock import ComplianceAirlock  # noqa: E402
+
+logging.getLogger("compliance_airlock").setLevel(logging.WARNING)
+
+
+@pytest.fixture(scope="session")
+def airlock() -> ComplianceAirlock:
+    return ComplianceAirlock()
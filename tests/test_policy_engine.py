@@ -0,0 +1,124 @@
+import re
+import json
+import time
+
+import pytest
+
+from policy_engine import PolicyEngine, RuleSet, _trie_pattern
+
+RULES = [
+    {"id": "codenames", "action": "block", "reason": "Codename", "terms": ["Project Orion", "Project Osprey", "Orion"]},
+    {"id": "competitor", "action": "review", "terms": ["LangChain", "Langflow"]},
+    {"id": "price", "action": "block", "reason": "Price", "pattern": r"\$\s?\d+", "triggers": ["$"]},
+    {"id": "claim", "action": "review", "pattern": r"\bguaranteed?\b"},
+]
+
+
+@pytest.mark.parametrize("terms", [
+    ["Project Orion", "Project Osprey"],
+    ["a", "ab", "abc"],
+    ["C++", "C#", "node.js"],
+    ["LangChain", "Langflow", "Lang"],
+])
+def test_trie_pattern_matches_like_an_alternation(terms):
+    trie = re.compile(_trie_pattern(terms), re.IGNORECASE)
+    plain = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")\b",
+                       re.IGNORECASE)
+    samples = [f"{t} x" for t in terms] + [f"x {t.upper()}." for t in terms] + [
+        "nothing here", "Projector Orionx", "Langchains", "abcd", "xC++", "Project  Orion"
+    ]
+    for sample in samples:
+        assert [m.group(0) for m in trie.finditer(sample)] == [m.group(0) for m in plain.finditer(sample)], sample
+
+
+def test_trie_pattern_shares_prefixes():
+    assert _trie_pattern(["Project Orion", "Project Osprey"]) == r"\bproject\ o(?:rion|sprey)\b"
+
+
+def test_block_beats_review_and_reports_reason():
+    rules = RuleSet(RULES, [])
+    assert rules.evaluate("Project Orion ships with LangChain support").blocked == "Codename"
+    assert rules.evaluate("It costs $ 40 a seat").blocked == "Price"
+    decision = rules.evaluate("We are guaranteed to beat langflow")
+    assert decision.blocked is None
+    assert decision.review == ["claim", "competitor"]
+
+
+def test_terms_match_whole_words_case_insensitively():
+    rules = RuleSet(RULES, [])
+    assert rules.evaluate("project orion").blocked == "Codename"
+    assert rules.evaluate("Orionids meteor shower").blocked is None
+    assert rules.evaluate("A plain answer.") == (None, [])
+
+
+def test_blocked_skips_review_rules():
+    rules = RuleSet(RULES, [])
+    assert rules.blocked("guaranteed LangChain") is None
+    assert rules.blocked("about $5") == "Price"
+
+
+def test_triggers_gate_pattern_rules():
+    # The pattern alone would match any number; without its trigger the rule is not consulted
+    rules = RuleSet([{"id": "p", "action": "block", "pattern": r"\d+", "triggers": ["usd"]}], [])
+    assert rules.evaluate("5 apples").blocked is None
+    assert rules.evaluate("5 USD").blocked == "p"
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RuleSet([{"id": "x", "action": "warn", "terms": ["a"]}], [])
+    with pytest.raises(ValueError):
+        RuleSet([{"id": "x", "action": "block"}], [])
+    with pytest.raises(re.error):
+        RuleSet([{"id": "x", "action": "block", "pattern": "("}], [])
+
+
+def test_version_changes_with_rules():
+    assert RuleSet(RULES, ["g"]).version == RuleSet(RULES, ["g"]).version
+    assert RuleSet(RULES, ["g"]).version != RuleSet(RULES[:1], ["g"]).version
+
+
+def write_policy(path, policy):
+    path.write_text(json.dumps(policy), encoding="utf-8")
+
+
+def test_departments_inherit_global_rules(tmp_path):
+    path = tmp_path / "policy.json"
+    write_policy(path, {
+        "global": {"guidelines": ["Be polite."], "rules": RULES[:1]},
+        "marketing": {"guidelines": ["No pricing."], "rules": RULES[2:3]},
+        "legal": ["Guidelines only."]
+    })
+    engine = PolicyEngine(str(path))
+    assert engine.evaluate("Project Orion", "marketing").blocked == "Codename"
+    assert engine.evaluate("$5", "marketing").blocked == "Price"
+    assert engine.evaluate("$5", "legal").blocked is None
+    assert engine.ruleset("legal").guidelines == ["Be polite.", "Guidelines only."]
+    # Unknown departments get the global rules
+    assert engine.evaluate("Project Orion", "sales").blocked == "Codename"
+
+
+def test_hot_reload_keeps_last_good_rules(tmp_path):
+    path = tmp_path / "policy.json"
+    write_policy(path, {"global": {"rules": RULES[:1]}})
+    engine = PolicyEngine(str(path), check_interval=0)
+    version = engine.ruleset("global").version
+    assert engine.evaluate("$5", "global").blocked is None
+
+    time.sleep(0.01)
+    write_policy(path, {"global": {"rules": RULES[:3]}})
+    assert engine.evaluate("$5", "global").blocked == "Price"
+    assert engine.ruleset("global").version != version
+
+    time.sleep(0.01)
+    path.write_text("{not json", encoding="utf-8")
+    assert engine.evaluate("$5", "global").blocked == "Price"
+
+
+def test_shipped_policy_compiles():
+    engine = PolicyEngine()
+    assert "global" in engine.departments()
+    assert engine.warm_up() > 0
+    # Credential talk reaches the judge in every department
+    for department in engine.departments():
+        assert "credentials" in engine.evaluate("the admin password is hunter2", department).review
@@ -0,0 +1,156 @@
+import pytest
+
+from session_store import NO_CONTEXT, SessionStore, count_tokens
+
+
+class FakeAirlock:
+    """Upper-cases text so sanitized turns are recognisable; "SECRET" makes a prompt HIGH risk."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return {
+            "safe_text": text.upper(),
+            "was_scrubbed": False,
+            "entities_found": ["AWS_KEY"] if "SECRET" in text else [],
+            "risk_level": "HIGH" if "SECRET" in text else "LOW",
+            "method": "fake"
+        }
+
+
+@pytest.fixture
+def sanitize():
+    return FakeAirlock()
+
+
+def converse(store, session_id, sanitize, prompts):
+    """Send each prompt alone, recording a canned answer, like a client that relies on the session."""
+    context = NO_CONTEXT
+    for i, prompt in enumerate(prompts):
+        report, context = store.prepare(session_id, [], prompt, sanitize)
+        store.record(session_id, "assistant", f"answer {i}")
+    return report, context
+
+
+def test_first_prompt_has_no_context(sanitize):
+    store = SessionStore()
+    report, context = store.prepare("s", [], "hello", sanitize)
+    assert report["safe_text"] == "HELLO"
+    assert context.messages == [] and context.digest == ""
+    assert context.tokens == count_tokens("HELLO")
+
+
+def test_follow_up_sends_stored_sanitized_turns(sanitize):
+    store = SessionStore()
+    store.prepare("s", [], "first question", sanitize)
+    store.record("s", "assistant", "first answer")
+    report, context = store.prepare("s", [], "second question", sanitize)
+    assert report["safe_text"] == "SECOND QUESTION"
+    assert context.messages == [
+        {"role": "user", "content": "FIRST QUESTION"},
+        {"role": "assistant", "content": "first answer"}
+    ]
+    assert context.turns == 2 and context.summarized == 0 and context.digest
+
+
+def test_resent_history_is_not_sanitized_again(sanitize):
+    store = SessionStore()
+    store.prepare("s", [], "first question", sanitize)
+    store.record("s", "assistant", "first answer")
+    history = [{"role": "user", "content": "first question"}, {"role": "assistant", "content": "first answer"}]
+    _, context = store.prepare("s", history, "second question", sanitize)
+    assert sanitize.calls == ["first question", "second question"]
+    assert context.turns == 2
+
+
+def test_rewritten_history_replaces_the_session(sanitize):
+    store = SessionStore()
+    converse(store, "s", sanitize, ["a question", "another"])
+    history = [{"role": "user", "content": "edited question"}, {"role": "assistant", "content": "answer"}]
+    _, context = store.prepare("s", history, "next", sanitize)
+    assert [m["content"] for m in context.messages] == ["EDITED QUESTION", "ANSWER"]
+
+
+def test_context_digest_tracks_the_conversation(sanitize):
+    store = SessionStore()
+    _, first = converse(store, "a", sanitize, ["one", "two"])
+    _, same = converse(store, "b", sanitize, ["one", "two"])
+    _, other = converse(store, "c", sanitize, ["one", "three"])
+    assert first.digest == same.digest
+    # Same earlier turns, so the digest only differs once the conversations diverge
+    _, later = store.prepare("c", [], "four", sanitize)
+    assert later.digest != first.digest
+    assert other.digest == first.digest
+
+
+def test_high_risk_prompt_is_not_stored(sanitize):
+    store = SessionStore()
+    converse(store, "s", sanitize, ["hello"])
+    report, context = store.prepare("s", [], "my SECRET key", sanitize)
+    assert report["risk_level"] == "HIGH" and context == NO_CONTEXT
+    _, context = store.prepare("s", [], "next", sanitize)
+    assert "MY SECRET KEY" not in [m["content"] for m in context.messages]
+
+
+def test_without_session_id_nothing_is_kept(sanitize):
+    store = SessionStore()
+    history = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "reply"}]
+    _, context = store.prepare(None, history, "now", sanitize)
+    assert [m["content"] for m in context.messages] == ["EARLIER", "reply".upper()]
+    assert store.stats()["sessions"] == 0
+
+
+def test_window_stays_within_the_token_budget(sanitize):
+    store = SessionStore(max_context_tokens=200, summary_tokens=60)
+    prompts = [f"Question number {i} about the quarterly plan. It has a second sentence." for i in range(30)]
+    _, context = converse(store, "s", sanitize, prompts)
+    assert context.tokens <= 200
+    assert context.summarized > 0
+    assert context.messages[0]["role"] == "system"
+    assert context.messages[0]["content"].startswith("Summary of the earlier conversation:")
+    assert count_tokens(context.messages[0]["content"]) <= 60
+    # The newest earlier turns are sent verbatim, in order, ending with the last answer
+    assert context.messages[-1] == {"role": "assistant", "content": "answer 28"}
+    assert context.turns + context.summarized == 2 * 29
+
+
+def test_summarized_turns_are_never_sent_verbatim_again(sanitize):
+    store = SessionStore(max_context_tokens=150, summary_tokens=50)
+    seen_summarized = 0
+    for i in range(40):
+        _, context = store.prepare("s", [], f"Prompt {i} with a reasonably long body of text.", sanitize)
+        store.record("s", "assistant", f"answer {i}")
+        assert context.summarized >= seen_summarized  # The summary only ever grows
+        seen_summarized = context.summarized
+        verbatim = [m["content"] for m in context.messages if m["role"] != "system"]
+        assert len(verbatim) == context.turns
+        assert context.summarized + context.turns == 2 * i
+    assert seen_summarized > 0
+
+
+def test_summary_keeps_only_the_first_sentence(sanitize):
+    store = SessionStore(max_context_tokens=100, summary_tokens=40)
+    converse(store, "s", sanitize, ["Short opener. " + "Long tail that should not be summarized. " * 8, "x", "y"])
+    _, context = store.prepare("s", [], "z", sanitize)
+    summary = context.messages[0]["content"]
+    assert "- user: SHORT OPENER." in summary and "LONG TAIL" not in summary
+
+
+def test_sessions_are_bounded_and_droppable(sanitize):
+    store = SessionStore(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        converse(store, session_id, sanitize, ["hi"])
+    assert store.stats()["sessions"] == 2
+    assert not store.drop("a")  # Evicted as the least recently used
+    assert store.drop("c")
+    _, context = store.prepare("c", [], "again", sanitize)
+    assert context.messages == []
+
+
+def test_expired_session_starts_over(sanitize):
+    store = SessionStore(ttl_seconds=-1)
+    converse(store, "s", sanitize, ["hi"])
+    _, context = store.prepare("s", [], "again", sanitize)
+    assert context.messages == []
@@ -1,10 +1,66 @@
+import os
 import re
 import logging
-from litellm import completion
+from typing import Optional
+from cache_store import TieredCache, cache_key, normalize_text
+from circuit_breaker import CircuitBreaker
+from judge_scheduler import JudgeScheduler
+from model_pool import load_litellm
+from policy_engine import PolicyEngine, RuleSet
+from telemetry import metrics
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_BATCH_VERDICT_LINE = re.compile(r"^\s*(\d+)\s*[:.)-]\s*(UNSAFE|SAFE)\b", re.MULTILINE | re.IGNORECASE)
+
+class StreamGuard:
+    """
+    Incremental forbidden-pattern check over a token stream, plus the
+    department's policy ``block`` rules when a ``ruleset`` is given.
+    
+    The last ``hold`` characters are never released, so any credential or
+    blocked phrase whose shortest match fits in that window is caught before
+    a byte of it reaches the client. ``lookback`` released characters are
+    still searched so a match can start just before the hold window.
+    """
+    
+    def __init__(self, pattern: re.Pattern, hold: int = 64, lookback: int = 256,
+                 ruleset: Optional[RuleSet] = None):
+        self.pattern = pattern
+        self.ruleset = ruleset
+        self.hold = hold
+        self.lookback = lookback
+        self.violated = False
+        self.issue = ""
+        self._released_tail = ""
+        self._pending = ""
+    
+    def feed(self, token: str) -> str:
+        """Add a token; returns the text that is now cleared for the client."""
+        if self.violated:
+            return ""
+        self._pending += token
+        window = self._released_tail + self._pending
+        if self.pattern.search(window):
+            self.issue = "Output contains credentials"
+        elif self.ruleset is not None:
+            self.issue = self.ruleset.blocked(window) or ""
+        if self.issue:
+            self.violated = True
+            self._pending = ""
+            return ""
+        if len(self._pending) <= self.hold:
+            return ""
+        cleared = self._pending[:-self.hold]
+        self._pending = self._pending[-self.hold:]
+        self._released_tail = (self._released_tail + cleared)[-self.lookback:]
+        return cleared
+    
+    def flush(self) -> str:
+        """End of stream: release whatever is still held back."""
+        cleared, self._pending = ("" if self.violated else self._pending), ""
+        return cleared
+
 class Tribunal:
     def __init__(self):
         self.JUDGE_MODEL = "ollama/llama3.2"
@@ -20,64 +76,240 @@ class Tribunal:
             r"I (?:can'?t|cannot) provide",
         ]
         
+        # Blacklist: Credentials that must never appear in an output
+        self.forbidden_patterns = [
+            r"sk-[a-zA-Z0-9]{20,}",              # OpenAI keys
+            r"AKIA[0-9A-Z]{16}",                  # AWS keys
+            r"ghp_[a-zA-Z0-9]{36,}",              # GitHub tokens
+            r"password\s*[=:]\s*['\"][^'\"]+",    # Hardcoded passwords
+            r"(?:api[_-]?key|secret)\s*[=:]\s*['\"][^'\"]+",  # API keys
+        ]
+        
+        self._forbidden = re.compile("|".join(f"(?:{p})" for p in self.forbidden_patterns), re.IGNORECASE)
+        self._refusals = re.compile("|".join(f"(?:{p})" for p in self.safe_refusals), re.IGNORECASE)
+        
+        # Department rules compiled from policy.json, recompiled when the file changes
+        self.policy = PolicyEngine(
+            os.getenv("POLICY_PATH") or None,
+            check_interval=float(os.getenv("POLICY_RELOAD_SECONDS", "1"))
+        )
+        # "ambiguous": only drafts a review rule flags go to the AI judge; "always": every undecided draft does
+        self.judge_mode = os.getenv("TRIBUNAL_JUDGE_MODE", "ambiguous")
+        
+        # Judge verdicts for repeated drafts (canned answers, FAQs) skip Ollama entirely
+        self.verdict_cache = TieredCache(
+            "tribunal",
+            max_entries=int(os.getenv("TRIBUNAL_CACHE_SIZE", "4096")),
+            ttl_seconds=float(os.getenv("TRIBUNAL_CACHE_TTL_SECONDS", "86400")),
+            disk_path=os.getenv("TRIBUNAL_CACHE_PATH") or None
+        )
+        
+        # One breaker shared by the sync and async paths: an unhealthy Ollama is skipped fast
+        self.breaker = CircuitBreaker(
+            "ollama-judge",
+            failure_threshold=int(os.getenv("TRIBUNAL_BREAKER_FAILURES", "3")),
+            cooldown_seconds=float(os.getenv("TRIBUNAL_BREAKER_COOLDOWN_SECONDS", "30"))
+        )
+        self.scheduler = JudgeScheduler(
+            self._ajudge_one,
+            self._ajudge_many,
+            breaker=self.breaker,
+            max_concurrency=int(os.getenv("TRIBUNAL_MAX_CONCURRENCY", "4")),
+            max_batch=int(os.getenv("TRIBUNAL_BATCH_SIZE", "8")),
+            batch_window=float(os.getenv("TRIBUNAL_BATCH_WINDOW_SECONDS", "0.005")),
+            queue_budget=float(os.getenv("TRIBUNAL_QUEUE_BUDGET_SECONDS", "2.0")),
+            mode=os.getenv("TRIBUNAL_BATCH_MODE", "parallel")
+        )
+        
         logger.info("✅ Tribunal initialized with safe refusal patterns")
 
+    async def warm_up(self, timeout: float = 120.0) -> str:
+        """
+        Have Ollama load the judge model now (a request without a prompt only
+        loads it), so the first judged draft does not wait for the model to
+        come off disk. ``TRIBUNAL_KEEP_ALIVE`` keeps it resident afterwards.
+        """
+        import httpx
+
+        if not self.JUDGE_MODEL.startswith("ollama/"):
+            return "skipped"
+        base = (os.getenv("OLLAMA_API_BASE") or "http://localhost:11434").rstrip("/")
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(f"{base}/api/generate", json={
+                "model": self.JUDGE_MODEL.split("/", 1)[1],
+                "keep_alive": os.getenv("TRIBUNAL_KEEP_ALIVE", "30m")
+            })
+            response.raise_for_status()
+        return "loaded"
+
+    def _precheck(self, draft: str, department: str = "general"):
+        """
+        Deterministic checks that settle a draft without the AI judge.
+        
+        Returns:
+            dict | None: A verdict, or None when the judge must decide
+        """
+        
+        # STEP 0: Auto-pass common refusals (bypass AI entirely)
+        if self._refusals.search(draft):
+            logger.info("✅ Standard refusal pattern detected, auto-passing")
+            return {"verdict": "PASS", "issues": []}
+        
+        # STEP 1: Check for actual secrets (regex-based, fast)
+        if self._forbidden.search(draft):
+            logger.error(f"🚨 Secret pattern detected in output")
+            return {"verdict": "FAIL", "issues": ["Output contains credentials"]}
+        
+        # STEP 2: Department policy rules (compiled from policy.json)
+        decision = self.policy.evaluate(draft, department)
+        if decision.blocked:
+            logger.warning(f"🚫 Policy rule hit ({department}): {decision.blocked}")
+            metrics.inc("gateway_policy_hits_total", action="block", department=department)
+            return {"verdict": "FAIL", "issues": [decision.blocked]}
+        if decision.review:
+            metrics.inc("gateway_policy_hits_total", action="review", department=department)
+        elif self.judge_mode != "always":
+            return {"verdict": "PASS", "issues": []}
+        
+        return None
+
+    def stream_guard(self, department: str = "general") -> StreamGuard:
+        """A fresh incremental checker for one streamed draft, with the department's block rules."""
+        return StreamGuard(self._forbidden, ruleset=self.policy.ruleset(department))
+
+    def _judge_key(self, draft: str, department: str) -> str:
+        # The judge only ever sees the first 500 characters, judged against this department's policy
+        version = self.policy.ruleset(department).version
+        return cache_key(self.JUDGE_MODEL, version, normalize_text(draft[:500]))
+
+    def _cached_verdict(self, key: str):
+        cached = self.verdict_cache.get(key)
+        if cached is not None:
+            logger.info("✅ Tribunal verdict cache hit")
+            return dict(cached)
+        return None
+
+    def _policy_text(self, department: str) -> str:
+        guidelines = self.policy.ruleset(department).guidelines
+        if not guidelines:
+            return ""
+        return f" Also reply 'UNSAFE' if the text breaks any of these {department} policies:\n" + \
+            "\n".join(f"- {g}" for g in guidelines) + "\n"
+
+    def _judge_request(self, draft: str, department: str = "general") -> dict:
+        return {
+            "model": self.JUDGE_MODEL,
+            "messages": [{
+                "role": "system", 
+                "content": "Reply ONLY with 'SAFE' or 'UNSAFE'. If you see passwords, API keys, or secrets, reply 'UNSAFE'." +
+                           self._policy_text(department) + " Otherwise reply 'SAFE'. No explanations."
+            }, {
+                "role": "user", 
+                "content": f"Check this text:\n\n{draft[:500]}"
+            }],
+            "temperature": 0.0,  # Zero creativity
+            "timeout": 10
+        }
+
+    def _judge_verdict(self, response) -> dict:
+        verdict = response.choices[0].message.content.strip().upper()
+        
+        # Only block if it explicitly says UNSAFE
+        if verdict == "UNSAFE":
+            logger.warning("⚠️ Tribunal AI flagged content as unsafe")
+            return {"verdict": "FAIL", "issues": ["Security risk detected by AI scan"]}
+        return {"verdict": "PASS", "issues": []}
+
+    async def _ajudge_one(self, item) -> dict:
+        department, text = item
+        return self._judge_verdict(await load_litellm().acompletion(**self._judge_request(text, department)))
+
+    async def _ajudge_many(self, items):
+        """Judge several (department, draft) items with one numbered prompt; unanswered items come back as None."""
+        numbered = "\n\n".join(
+            f"Text {i} (department: {department}):\n{text}" for i, (department, text) in enumerate(items, start=1)
+        )
+        policies = "".join(self._policy_text(d) for d in sorted({d for d, _ in items}))
+        response = await load_litellm().acompletion(
+            model=self.JUDGE_MODEL,
+            messages=[{
+                "role": "system",
+                "content": f"You will receive {len(items)} numbered texts. For each one reply with exactly one line '<number>: SAFE' or '<number>: UNSAFE'. A text with passwords, API keys, or secrets is UNSAFE." + policies + " Judge each text only against its own department's policies. No explanations."
+            }, {
+                "role": "user",
+                "content": numbered
+            }],
+            temperature=0.0,
+            timeout=10
+        )
+        answers = {}
+        for number, label in _BATCH_VERDICT_LINE.findall(response.choices[0].message.content):
+            answers[int(number)] = label.upper()
+        verdicts = []
+        for i in range(1, len(items) + 1):
+            if i not in answers:
+                verdicts.append(None)
+            elif answers[i] == "UNSAFE":
+                logger.warning("⚠️ Tribunal AI flagged content as unsafe")
+                verdicts.append({"verdict": "FAIL", "issues": ["Security risk detected by AI scan"]})
+            else:
+                verdicts.append({"verdict": "PASS", "issues": []})
+        return verdicts
+
     def verify(self, draft: str, domain: str = "general"):
         """
         Verify draft against security policies.
         
         Args:
             draft: The LLM-generated response to validate
-            domain: Department context (unused in this version)
+            domain: Department whose policy.json rules apply
             
         Returns:
             dict: {"verdict": "PASS" | "FAIL", "issues": list}
         """
-        
-        # STEP 0: Auto-pass common refusals (bypass AI entirely)
-        for pattern in self.safe_refusals:
-            if re.search(pattern, draft, re.IGNORECASE):
-                logger.info("✅ Standard refusal pattern detected, auto-passing")
-                return {"verdict": "PASS", "issues": []}
-        
-        # STEP 1: Check for actual secrets (regex-based, fast)
-        forbidden_patterns = [
-            r"sk-[a-zA-Z0-9]{20,}",              # OpenAI keys
-            r"AKIA[0-9A-Z]{16}",                  # AWS keys
-            r"ghp_[a-zA-Z0-9]{36,}",              # GitHub tokens
-            r"password\s*[=:]\s*['\"][^'\"]+",    # Hardcoded passwords
-            r"(?:api[_-]?key|secret)\s*[=:]\s*['\"][^'\"]+",  # API keys
-        ]
-        
-        for pattern in forbidden_patterns:
-            if re.search(pattern, draft, re.IGNORECASE):
-                logger.error(f"🚨 Secret pattern detected in output")
-                return {"verdict": "FAIL", "issues": ["Output contains credentials"]}
+        decided = self._precheck(draft, domain)
+        if decided is not None:
+            return decided
+
+        key = self._judge_key(draft, domain)
+        cached = self._cached_verdict(key)
+        if cached is not None:
+            return cached
 
-        # STEP 2: AI Check (only for edge cases now)
+        # STEP 3: AI Check (only for edge cases now)
+        if not self.breaker.allow():
+            logger.warning("⚠️ Tribunal judge circuit open, defaulting to PASS (fail-open)")
+            metrics.inc("gateway_judge_fail_open_total", reason="circuit_open")
+            return {"verdict": "PASS", "issues": []}
         try:
-            response = completion(
-                model=self.JUDGE_MODEL,
-                messages=[{
-                    "role": "system", 
-                    "content": "Reply ONLY with 'SAFE' or 'UNSAFE'. If you see passwords, API keys, or secrets, reply 'UNSAFE'. Otherwise reply 'SAFE'. No explanations."
-                }, {
-                    "role": "user", 
-                    "content": f"Check this text:\n\n{draft[:500]}"
-                }],
-                temperature=0.0,  # Zero creativity
-                timeout=10
-            )
-            
-            verdict = response.choices[0].message.content.strip().upper()
-            
-            # Only block if it explicitly says UNSAFE
-            if verdict == "UNSAFE":
-                logger.warning("⚠️ Tribunal AI flagged content as unsafe")
-                return {"verdict": "FAIL", "issues": ["Security risk detected by AI scan"]}
-                
+            verdict = self._judge_verdict(load_litellm().completion(**self._judge_request(draft, domain)))
         except Exception as e:
+            self.breaker.record_failure()
             logger.warning(f"⚠️ Tribunal check failed: {e}, defaulting to PASS (fail-open)")
-            pass  # If Ollama fails, fail-open
+            metrics.inc("gateway_judge_fail_open_total", reason="error")
+            return {"verdict": "PASS", "issues": []}  # If Ollama fails, fail-open (never cached)
         
-        return {"verdict": "PASS", "issues": []}
+        self.breaker.record_success()
+        self.verdict_cache.set(key, verdict)
+        return verdict
+
+    async def averify(self, draft: str, domain: str = "general"):
+        """Async twin of ``verify``: the judge call goes through the micro-batching scheduler."""
+        decided = self._precheck(draft, domain)
+        if decided is not None:
+            return decided
+
+        key = self._judge_key(draft, domain)
+        cached = self._cached_verdict(key)
+        if cached is not None:
+            return cached
+
+        # Batched, concurrency-limited and circuit-broken; None means the judge was skipped or failed
+        verdict, reason = await self.scheduler.judge((domain, draft[:500]))
+        if verdict is None:
+            logger.warning(f"⚠️ Tribunal check unavailable ({reason}), defaulting to PASS (fail-open)")
+            metrics.inc("gateway_judge_fail_open_total", reason=reason)
+            return {"verdict": "PASS", "issues": []}  # If Ollama fails, fail-open (never cached)
+        
+        self.verdict_cache.set(key, verdict)
+        return verdict
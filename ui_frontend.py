@@ -1,18 +1,96 @@
+import os
+import json
+import time
+import uuid
 import streamlit as st
 import requests
-import time
+from requests.adapters import HTTPAdapter
+
+API_URL = os.getenv("GATEWAY_API_URL", "http://localhost:8000")
+HEALTH_TTL_SECONDS = 5       # Sidebar status is re-probed at most this often, not on every rerun
+RESULT_TIMEOUT_SECONDS = 120  # Give up on a job after this long
+PAGE_SIZE = 20                # Chat messages rendered per "show earlier" page
 
 st.set_page_config(page_title="Sovereign AI Gateway", layout="wide", page_icon="🛡️")
 
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One keep-alive connection pool to the gateway, shared by every rerun and browser tab."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=HEALTH_TTL_SECONDS, show_spinner=False)
+def gateway_status() -> str:
+    try:
+        resp = http_session().get(f"{API_URL}/readyz", timeout=2)
+    except requests.RequestException:
+        return "offline"
+    return resp.json().get("status", "unknown") if resp.status_code in (200, 503) else "unknown"
+
+
+def wait_for_result(job_id: str) -> dict:
+    """
+    Block until the gateway pushes the job's result over SSE (``/events``);
+    heartbeats keep the connection open while the job runs.
+    """
+    deadline = time.monotonic() + RESULT_TIMEOUT_SECONDS
+    with http_session().get(f"{API_URL}/events/{job_id}", stream=True, timeout=(5, 30)) as resp:
+        resp.raise_for_status()
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if time.monotonic() > deadline:
+                break
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:") and event == "result":
+                return json.loads(line[5:])
+    return {"status": "TIMEOUT"}
+
+
+def render_audit_trail(data: dict, full: bool):
+    """One-line summary always; metrics, redactions and the raw JSON only when asked for."""
+    st.caption(
+        f"🧠 {data.get('model_used', 'N/A')} · ⚖️ {data.get('verdict', 'N/A')} · "
+        f"💰 ${data.get('savings', 0):.4f}" + (" · 🔒 PII scrubbed" if data.get("pii_scrubbed") else "")
+    )
+    if not full:
+        return
+    c1, c2 = st.columns(2)
+    c1.metric("Model Used", data.get("model_used", "N/A"))
+    c1.metric("Verdict", data.get("verdict", "N/A"))
+    c2.metric("Savings", f"${data.get('savings', 0):.4f}")
+    pii_status = "Yes ✅" if data.get("pii_scrubbed") else "No"
+    c2.metric("PII Scrubbed", pii_status)
+
+    # Show redacted content if PII was scrubbed
+    if data.get("pii_scrubbed"):
+        st.warning("🔒 Sensitive data was redacted before sending to API")
+        st.code(data.get("safe_prompt", "N/A"), language=None)
+        if data.get("entities_found"):
+            st.info(f"Detected: {', '.join(data.get('entities_found', []))}")
+
+    # Full JSON
+    st.json(data)
+
+
 # Initialize Session State
-if "total_savings" not in st.session_state: 
+if "total_savings" not in st.session_state:
     st.session_state.total_savings = 0.0
-if "pii_blocks" not in st.session_state: 
+if "pii_blocks" not in st.session_state:
     st.session_state.pii_blocks = 0
-if "policy_violations" not in st.session_state: 
+if "policy_violations" not in st.session_state:
     st.session_state.policy_violations = 0
-if "messages" not in st.session_state: 
+if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:  # The gateway keeps the conversation under this id
+    st.session_state.session_id = str(uuid.uuid4())
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1
 
 st.title("🛡️ Sovereign AI Gateway (M4 Edition)")
 
@@ -27,32 +105,42 @@ st.divider()
 with st.sidebar:
     st.header("⚙️ Configuration")
     dept = st.selectbox(
-        "Department Context", 
+        "Department Context",
         ["marketing", "engineering", "legal"],
         help="Select your department for context-specific routing"
     )
-    
+
     st.divider()
-    
+
     if st.button("🔄 Reset Session", use_container_width=True):
         st.session_state.total_savings = 0.0
         st.session_state.pii_blocks = 0
         st.session_state.policy_violations = 0
         st.session_state.messages = []
+        st.session_state.history_pages = 1
+        try:
+            http_session().delete(f"{API_URL}/sessions/{st.session_state.session_id}", timeout=2)
+        except requests.RequestException:
+            pass  # Unreachable gateway: the old session simply expires
+        st.session_state.session_id = str(uuid.uuid4())
         st.rerun()
-    
+
     st.divider()
-    
+
     # System Status
     st.subheader("🔧 System Status")
-    try:
-        health = requests.get("http://localhost:8000/health", timeout=2).json()
-        st.success(f"✅ API Server: {health.get('status', 'unknown').title()}")
-    except:
+    status = gateway_status()
+    if status == "ready":
+        st.success("✅ API Server: Ready")
+    elif status == "warming_up":
+        st.warning("⏳ API Server: Warming up")
+    elif status == "offline":
         st.error("❌ API Server: Offline")
-    
+    else:
+        st.error(f"❌ API Server: {status.replace('_', ' ').title()}")
+
     st.divider()
-    
+
     # Info
     with st.expander("ℹ️ About"):
         st.markdown("""
@@ -62,37 +150,29 @@ with st.sidebar:
         - 📋 Policy Enforcement
         - 💰 Cost Optimization
         - 📊 Audit Logging
-        
+
         Routes general queries to GPT-4o-mini for cost savings.
         Technical queries use GPT-4o for better code quality.
         """)
 
 # --- CHAT INTERFACE ---
-for msg in st.session_state.messages:
+# Only the newest pages are rendered; long chats cost the same per rerun as short ones
+messages = st.session_state.messages
+shown = min(len(messages), st.session_state.history_pages * PAGE_SIZE)
+first = len(messages) - shown
+if first > 0 and st.button(f"⬆️ Show earlier messages ({first} hidden)"):
+    st.session_state.history_pages += 1
+    st.rerun()
+
+for index in range(first, len(messages)):
+    msg = messages[index]
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
-        
-        # Show audit trail for assistant messages
+
+        # Show audit trail for assistant messages (details only for the ones toggled open)
         if msg["role"] == "assistant" and "metadata" in msg:
-            data = msg["metadata"]
-            with st.expander("🔍 View Audit Trail"):
-                # Metrics display
-                c1, c2 = st.columns(2)
-                c1.metric("Model Used", data.get("model_used", "N/A"))
-                c1.metric("Verdict", data.get("verdict", "N/A"))
-                c2.metric("Savings", f"${data.get('savings', 0):.4f}")
-                pii_status = "Yes ✅" if data.get("pii_scrubbed") else "No"
-                c2.metric("PII Scrubbed", pii_status)
-                
-                # Show redacted content if PII was scrubbed
-                if data.get("pii_scrubbed"):
-                    st.warning("🔒 Sensitive data was redacted before sending to API")
-                    st.code(data.get("safe_prompt", "N/A"), language=None)
-                    if data.get("entities_found"):
-                        st.info(f"Detected: {', '.join(data.get('entities_found', []))}")
-                
-                # Full JSON
-                st.json(data)
+            full = st.toggle("🔍 View Audit Trail", key=f"audit_{msg.get('id', index)}")
+            render_audit_trail(msg["metadata"], full)
 
 # --- INPUT HANDLER ---
 if prompt := st.chat_input("Enter your prompt..."):
@@ -104,42 +184,30 @@ if prompt := st.chat_input("Enter your prompt..."):
     # Process request
     with st.spinner("🔄 Processing through Sovereign Gateway..."):
         try:
-            # Submit request
-            resp = requests.post(
-                "http://localhost:8000/submit", 
-                json={"messages": [{"content": prompt}], "department": dept},
+            # Submit request (the gateway holds the earlier turns for this session)
+            resp = http_session().post(
+                f"{API_URL}/submit",
+                json={"messages": [{"role": "user", "content": prompt}], "department": dept,
+                      "session_id": st.session_state.session_id},
                 timeout=5
             )
-            
+
             # Check for errors
+            if resp.status_code == 429:
+                st.warning(f"🚦 Gateway busy - retry in {resp.headers.get('Retry-After', 'a few')}s")
+                st.session_state.messages.pop()
+                st.stop()
             if resp.status_code != 200:
                 st.error(f"❌ API Error: {resp.status_code}")
                 st.code(resp.text)
+                st.session_state.messages.pop()
                 st.stop()
-            
+
             job_id = resp.json()["request_id"]
-            
-            # Poll for completion (max 60 seconds)
-            max_attempts = 120  # 60 seconds with 0.5s sleep
-            for attempt in range(max_attempts):
-                status_resp = requests.get(
-                    f"http://localhost:8000/status/{job_id}",
-                    timeout=5
-                )
-                
-                if status_resp.status_code == 200:
-                    data = status_resp.json()
-                    
-                    if data.get("status") in ["COMPLETED", "ERROR"]:
-                        break
-                
-                time.sleep(0.5)
-            else:
-                # Timeout after 60 seconds
-                st.error("⏱️ Request timeout - please try again")
-                st.session_state.messages.pop()  # Remove failed user message
-                st.stop()
-            
+
+            # The result is pushed the moment it is stored, no polling
+            data = wait_for_result(job_id)
+
             # Handle completed request
             if data.get("status") == "COMPLETED":
                 # Update session metrics
@@ -148,7 +216,7 @@ if prompt := st.chat_input("Enter your prompt..."):
                 if data.get("verdict") == "FAIL":
                     st.session_state.policy_violations += 1
                 st.session_state.total_savings += data.get("savings", 0.0)
-                
+
                 # Prepare metadata
                 metadata = {
                     "model_used": data.get("model_used", "N/A"),
@@ -157,44 +225,27 @@ if prompt := st.chat_input("Enter your prompt..."):
                     "entities_found": data.get("entities_found", []),
                     "verdict": data.get("verdict", "N/A"),
                     "savings": data.get("savings", 0.0),
-                    "sanitization_method": data.get("sanitization_method", "Unknown")
+                    "sanitization_method": data.get("sanitization_method", "Unknown"),
+                    "timings_ms": data.get("timings_ms", {})
                 }
-                
-                # Display response
-                output_text = data.get("output", "No output received.")
-                
-                with st.chat_message("assistant"):
-                    st.markdown(output_text)
-                    
-                    with st.expander("🔍 View Audit Trail"):
-                        c1, c2 = st.columns(2)
-                        c1.metric("Model Used", metadata["model_used"])
-                        c1.metric("Verdict", metadata["verdict"])
-                        c2.metric("Savings", f"${metadata['savings']:.4f}")
-                        pii_status = "Yes ✅" if metadata["pii_scrubbed"] else "No"
-                        c2.metric("PII Scrubbed", pii_status)
-                        
-                        if metadata["pii_scrubbed"]:
-                            st.warning("🔒 Sensitive data was redacted")
-                            st.code(metadata["safe_prompt"], language=None)
-                            if metadata["entities_found"]:
-                                st.info(f"Detected: {', '.join(metadata['entities_found'])}")
-                        
-                        st.json(metadata)
-                
-                # Save to session
+
+                # Save to session; the rerun renders it with the rest of the page
                 st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": output_text, 
+                    "id": job_id,
+                    "role": "assistant",
+                    "content": data.get("output", "No output received."),
                     "metadata": metadata
                 })
-                
+
                 st.rerun()
-            
-            elif data.get("status") == "ERROR":
+
+            elif data.get("status") == "TIMEOUT":
+                st.error("⏱️ Request timeout - please try again")
+                st.session_state.messages.pop()  # Remove failed user message
+            else:
                 st.error(f"❌ Processing Error: {data.get('output', 'Unknown error')}")
                 st.session_state.messages.pop()  # Remove failed user message
-                
+
         except requests.exceptions.ConnectionError:
             st.error("❌ Connection Error: Cannot reach API server")
             st.info("💡 Make sure the API server is running: `python api_server.py`")